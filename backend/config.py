@@ -9,8 +9,9 @@ import json
 import os
 import re
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -24,6 +25,9 @@ CONFIG_FILE = Path(__file__).parent / "config.json"
 # Global config cache
 _config_data: Optional[Dict] = None
 
+# Callables run after Config.reload() so derived caches can drop stale entries
+_reload_hooks: List[Callable[[], None]] = []
+
 
 def _interpolate_env_vars(value: Any) -> Any:
     """
@@ -105,6 +109,21 @@ def load_config(force_reload: bool = False) -> Dict:
         raise
 
 
+@lru_cache(maxsize=64)
+def _resolve_db_path(db_path: str) -> str:
+    """
+    Resolve a configured db_path relative to the project root.
+
+    Cached: resolve() hits the filesystem, and get_dataset() runs per request.
+    """
+    path = Path(db_path)
+    if path.is_absolute():
+        return db_path
+    # Resolve relative to project root
+    project_root = Path(__file__).parent.parent
+    return str((project_root / path).resolve())
+
+
 def _get_nested(data: Dict, *path: str, default: Any = None) -> Any:
     """
     Navigate nested dictionary using path.
@@ -154,8 +173,18 @@ class Config:
     CLAUDE_MODEL: str = None
     CLAUDE_MAX_TOKENS: int = None
     CLAUDE_TIMEOUT: int = None
+    CLAUDE_REQUESTS_PER_MINUTE: int = None
+    CLAUDE_INPUT_TOKENS_PER_MINUTE: int = None
+    CLAUDE_MAX_INSTRUCTION_CHARS: int = None
+    CLAUDE_MAX_SCHEMA_CHARS: int = None
     MAX_QUERY_RESULTS: int = None
     QUERY_TIMEOUT: int = None
+    QUERY_CACHE_SIZE: int = None
+    QUERY_CACHE_TTL: int = None
+    SEMANTIC_CACHE_ENABLED: bool = None
+    SEMANTIC_CACHE_MODEL: str = None
+    SEMANTIC_CACHE_THRESHOLD: float = None
+    SEMANTIC_CACHE_TTL: int = None
     DATABASE_PATH: str = None
     
     @classmethod
@@ -182,8 +211,22 @@ class Config:
         cls.CLAUDE_MODEL = _get_nested(_config_data, 'claude', 'model', default='claude-sonnet-4-5-20250929')
         cls.CLAUDE_MAX_TOKENS = _get_nested(_config_data, 'claude', 'max_tokens', default=1000)
         cls.CLAUDE_TIMEOUT = _get_nested(_config_data, 'claude', 'timeout', default=10)
+        # Client-side rate limits (default: 80% of the tier 1 limits; 0 or null = unlimited)
+        cls.CLAUDE_REQUESTS_PER_MINUTE = _get_nested(_config_data, 'claude', 'requests_per_minute', default=40)
+        cls.CLAUDE_INPUT_TOKENS_PER_MINUTE = _get_nested(_config_data, 'claude', 'input_tokens_per_minute', default=24000)
+        # System prompt size caps (characters) for dataset instructions and the rendered schema
+        cls.CLAUDE_MAX_INSTRUCTION_CHARS = _get_nested(_config_data, 'claude', 'max_instruction_chars', default=32000)
+        cls.CLAUDE_MAX_SCHEMA_CHARS = _get_nested(_config_data, 'claude', 'max_schema_chars', default=64000)
         cls.MAX_QUERY_RESULTS = _get_nested(_config_data, 'query_execution', 'max_results', default=1000)
         cls.QUERY_TIMEOUT = _get_nested(_config_data, 'query_execution', 'timeout', default=30)
+        # Exact-match result cache for repeated SQL (cache_size 0 disables it)
+        cls.QUERY_CACHE_SIZE = _get_nested(_config_data, 'query_execution', 'cache_size', default=256)
+        cls.QUERY_CACHE_TTL = _get_nested(_config_data, 'query_execution', 'cache_ttl_seconds', default=300)
+        # Off by default - a near-duplicate hit returns earlier SQL without calling Claude
+        cls.SEMANTIC_CACHE_ENABLED = _get_nested(_config_data, 'semantic_cache', 'enabled', default=False)
+        cls.SEMANTIC_CACHE_MODEL = _get_nested(_config_data, 'semantic_cache', 'model', default='sentence-transformers/all-MiniLM-L6-v2')
+        cls.SEMANTIC_CACHE_THRESHOLD = _get_nested(_config_data, 'semantic_cache', 'similarity_threshold', default=0.95)
+        cls.SEMANTIC_CACHE_TTL = _get_nested(_config_data, 'semantic_cache', 'ttl_seconds', default=3600)
         
         # DATABASE_PATH from active dataset
         try:
@@ -239,11 +282,7 @@ class Config:
         
         # Resolve relative paths to absolute
         if 'db_path' in dataset_config:
-            db_path = Path(dataset_config['db_path'])
-            if not db_path.is_absolute():
-                # Resolve relative to project root
-                project_root = Path(__file__).parent.parent
-                dataset_config['db_path'] = str((project_root / db_path).resolve())
+            dataset_config['db_path'] = _resolve_db_path(dataset_config['db_path'])
         
         return dataset_config
     
@@ -379,7 +418,20 @@ class Config:
         """Reload configuration from config.json"""
         load_config(force_reload=True)
         cls._initialize_attributes()
+        _resolve_db_path.cache_clear()
+        for hook in _reload_hooks:
+            hook()
         logger.info("Configuration reloaded")
+
+    @classmethod
+    def register_reload_hook(cls, hook: Callable[[], None]) -> None:
+        """
+        Register a callable to run after every reload().
+
+        Args:
+            hook: No-argument callable, e.g. a cache's cache_clear
+        """
+        _reload_hooks.append(hook)
     
     @classmethod
     def get_database_url(cls):
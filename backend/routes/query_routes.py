@@ -24,7 +24,7 @@ query_bp = Blueprint('query', __name__)
 
 # Initialize services with active dataset
 active_dataset = Config.get_active_dataset()
-claude_service = ClaudeService(dataset_id=active_dataset)
+claude_service = ClaudeService.get(active_dataset)
 query_executor = QueryExecutor()
 agentic_service = AgenticText2SQLService(dataset_id=active_dataset)
 
@@ -167,6 +167,9 @@ def execute_query():
             }), 500
         query_execution_time = time.time() - query_execution_start
 
+        # Validated and executed - near-duplicate questions may reuse this SQL
+        claude_service.cache_result(query, client_id, sql_query)
+
         # Calculate total time
         total_time = time.time() - start_time
 
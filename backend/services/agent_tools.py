@@ -10,12 +10,16 @@ Provides:
 Architecture Reference: docs/architecture-agentic-text2sql.md Section 6.1
 """
 
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache
 import logging
+import os
 import sqlite3
 from pathlib import Path
 
+from services.query_executor import apply_read_pragmas, sqlite_read_only_uri
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,13 +57,13 @@ class Tool:
             - Failure: {success: False, tool: str, error: str, elapsed: float}
         """
         start_time = datetime.now()
-        logger.info(f"Executing tool '{self.name}' with params: {list(kwargs.keys())}")
+        logger.info("Executing tool '%s' with params: %s", self.name, list(kwargs))
         
         try:
             result = self.function(**kwargs)
             
             elapsed = (datetime.now() - start_time).total_seconds()
-            logger.info(f"Tool '{self.name}' succeeded in {elapsed:.3f}s")
+            logger.info("Tool '%s' succeeded in %.3fs", self.name, elapsed)
             
             return {
                 "success": True,
@@ -258,19 +262,12 @@ def get_sample_data(db_path: str, table_name: str, limit: int = 5) -> List[Dict]
     try:
         logger.info(f"Fetching {limit} sample rows from {table_name}")
         
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
-        cursor = conn.cursor()
-        
-        cursor.execute(f"SELECT * FROM {table_name} LIMIT ?", (limit,))
-        rows = cursor.fetchall()
+        # Keyed by the file's mtime, so a changed database is re-read
+        rows = _fetch_sample_rows(db_path, os.path.getmtime(db_path), table_name, limit)
         
-        # Convert to list of dicts
+        # Convert to list of dicts (callers own their copies)
         result = [dict(row) for row in rows]
         
-        cursor.close()
-        conn.close()
-        
         logger.info(f"Retrieved {len(result)} sample rows")
         return result
         
@@ -279,6 +276,23 @@ def get_sample_data(db_path: str, table_name: str, limit: int = 5) -> List[Dict]
         return []
 
 
+@lru_cache(maxsize=128)
+def _fetch_sample_rows(db_path: str, db_mtime: float, table_name: str, limit: int) -> Tuple[Dict, ...]:
+    """
+    Read sample rows once per (database version, table, limit).
+    
+    db_mtime only takes part in the cache key. Errors propagate and are not cached.
+    """
+    conn = sqlite3.connect(sqlite_read_only_uri(db_path), uri=True)
+    try:
+        apply_read_pragmas(conn)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        cursor = conn.execute(f"SELECT * FROM {table_name} LIMIT ?", (limit,))
+        return tuple(dict(row) for row in cursor.fetchall())
+    finally:
+        conn.close()
+
+
 def format_metadata_for_prompt(metadata_docs: List[Dict], max_docs: int = 5) -> str:
     """
     Format metadata documents into a string suitable for LLM context.
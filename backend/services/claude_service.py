@@ -5,18 +5,28 @@ This service integrates with Anthropic's Claude API to convert natural language
 queries into SQL queries for the retail market research database.
 """
 
+import hashlib
 import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import ClassVar, Dict, Optional, Tuple
 from anthropic import Anthropic, APIError, APITimeoutError
+from jinja2 import Environment
 from config import Config
+from services.semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
 # Import metadata loader for dataset-specific instructions
 try:
-    from services.metadata_loader import MetadataLoader
+    from services.metadata_loader import MetadataLoader, load_dataset_metadata
 except ImportError:
     logger.warning("MetadataLoader not available, dataset-specific instructions will be disabled")
-    MetadataLoader = None
+    MetadataLoader = load_dataset_metadata = None
 
 
 # Base LLM instructions that apply to ALL datasets (generic SQL rules)
@@ -41,11 +51,20 @@ BASE_LLM_INSTRUCTIONS = """You are an expert SQL query generator for SQLite data
 - Use proper aggregate functions: SUM(), COUNT(), AVG(), MIN(), MAX()
 - Always order results meaningfully (typically by the metric DESC or by date)
 
-{DYNAMIC_SCHEMA_PLACEHOLDER}
+{% if schema %}
+## Database Schema
 
-{DATASET_SPECIFIC_INSTRUCTIONS}
+{{ schema }}
+{% endif %}
 
-{FILTER_INSTRUCTION}
+{% if dataset_instructions %}
+## Dataset-Specific Patterns
+
+{{ dataset_instructions }}
+{% endif %}
+
+
+{{ visualization_instructions }}
 """
 
 
@@ -67,15 +86,14 @@ After generating SQL, analyze the query structure and determine optimal visualiz
 - Y-axis: The measure(s) being aggregated (SUM, AVG, COUNT results)
 
 **Output Format:**
-Along with SQL, return chart_metadata as JSON:
+Return the SQL as plain text. Report chart metadata by calling the emit_chart_metadata
+tool - do NOT write chart_metadata JSON in the text response:
 {
-  "chart_metadata": {
-    "type": "line|bar|pie|metric|table",
-    "x_axis": "column_name_from_select",
-    "y_axes": ["measure_column_1", "measure_column_2"],
-    "recommended": true|false,
-    "reason": "Explanation for chart choice or why not recommended"
-  }
+  "type": "line|bar|pie|metric|table",
+  "x_axis": "column_name_from_select",
+  "y_axes": ["measure_column_1", "measure_column_2"],
+  "recommended": true|false,
+  "reason": "Explanation for chart choice or why not recommended"
 }
 
 **When NOT to recommend charts (recommended: false):**
@@ -88,7 +106,7 @@ Along with SQL, return chart_metadata as JSON:
 
 Query: "Show market trend in 2024"
 SQL: SELECT year, SUM(market_size_value) as total_value ... GROUP BY year
-chart_metadata: {
+emit_chart_metadata: {
   "type": "line",
   "x_axis": "year",
   "y_axes": ["total_value"],
@@ -98,7 +116,7 @@ chart_metadata: {
 
 Query: "Top 10 brands by revenue"
 SQL: SELECT brand_name, SUM(revenue) as total_revenue ... ORDER BY total_revenue DESC LIMIT 10
-chart_metadata: {
+emit_chart_metadata: {
   "type": "bar",
   "x_axis": "brand_name",
   "y_axes": ["total_revenue"],
@@ -108,7 +126,7 @@ chart_metadata: {
 
 Query: "List all transactions"
 SQL: SELECT * FROM transactions LIMIT 1000
-chart_metadata: {
+emit_chart_metadata: {
   "type": "table",
   "x_axis": null,
   "y_axes": [],
@@ -117,79 +135,279 @@ chart_metadata: {
 }
 """
 
+# Client-independent system prompt (rules, schema, dataset patterns, visualization
+# guidance), compiled once; optional sections are skipped instead of blanked
+SYSTEM_PROMPT_TEMPLATE = Environment(autoescape=False, keep_trailing_newline=True).from_string(
+    BASE_LLM_INSTRUCTIONS
+)
+
+# Tool schema for chart metadata - Claude returns it as a structured tool_use
+# block next to the SQL text, so nothing has to be scraped out of the text
+CHART_METADATA_TOOL = {
+    "name": "emit_chart_metadata",
+    "description": "Report the recommended visualization for the generated SQL query.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "type": {"type": "string", "enum": ["bar", "line", "pie", "table", "metric"]},
+            "x_axis": {"type": ["string", "null"]},
+            "y_axes": {"type": "array", "items": {"type": "string"}},
+            "recommended": {"type": "boolean"},
+            "reason": {"type": "string"}
+        },
+        "required": ["type", "y_axes", "recommended"]
+    }
+}
 
-class ClaudeService:
-    """Service for interacting with Claude API to generate SQL queries."""
+# Placeholder in cached system prompts; templates are split on it and joined per call with the real client ID
+CLIENT_ID_PLACEHOLDER = "{client_id}"
 
-    def __init__(self, api_key=None, dataset_id=None):
-        """
-        Initialize Claude service with hybrid instruction loading.
+# Upper bound on cached system prompt templates per service instance
+SYSTEM_PROMPT_CACHE_SIZE = 32
 
-        Args:
-            api_key (str, optional): Anthropic API key. Uses Config.ANTHROPIC_API_KEY if None.
-            dataset_id (str, optional): Dataset ID for loading metadata
-        """
-        self.api_key = api_key or Config.ANTHROPIC_API_KEY
+# Anthropic prompt caching: the client-independent system prompt prefix is cached server-side
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+PROMPT_CACHING_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
 
-        if not self.api_key:
-            raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY in .env file.")
+# Markdown code fence lines (```sql ... ```) around generated SQL
+_FENCE_RE = re.compile(r'^```[a-zA-Z]*[ \t]*\n?|\n?```[ \t]*$', re.MULTILINE)
 
-        self.client = Anthropic(api_key=self.api_key)
-        self.model = Config.CLAUDE_MODEL
-        self.max_tokens = Config.CLAUDE_MAX_TOKENS
-        self.timeout = Config.CLAUDE_TIMEOUT
+# Rough chars-per-token ratio for estimating request size against the token limit
+CHARS_PER_TOKEN = 4
 
-        # Load dataset-specific instructions from metadata
-        self.dataset_id = dataset_id
-        self.dataset_specific_instructions = self._load_dataset_instructions(dataset_id)
+# Message Batches status polling interval (batches typically finish within minutes)
+BATCH_POLL_INTERVAL_SECONDS = 20
 
-        logger.info(f"Claude service initialized with model: {self.model}, dataset: {dataset_id}")
+# Word tokens for matching queries against dataset instruction sections
+_WORD_RE = re.compile(r'[a-z0-9_]+')
 
-    def _load_dataset_instructions(self, dataset_id):
-        """Load dataset-specific instructions from metadata (hybrid approach)."""
-        if not dataset_id:
-            logger.warning("No dataset_id provided, no dataset-specific instructions loaded")
-            return ""
+# Separator between dataset instruction sections
+SECTION_SEPARATOR = "\n\n"
 
-        if not MetadataLoader:
-            logger.warning("MetadataLoader not available, using generic instructions only")
-            return ""
 
-        try:
-            metadata_loader = MetadataLoader(dataset_id=dataset_id)
-            # Load all metadata first
-            metadata_loader.load_all()
-            # Try business_rules first, fallback to llm_instructions for backward compatibility
-            docs = metadata_loader.get_documents_by_file('business_rules')
-            if not docs:
-                docs = metadata_loader.get_documents_by_file('llm_instructions')
-
-            if docs:
-                # Combine all sections
-                instructions = "\n\n".join([doc.content for doc in docs])
-                logger.info(f"Loaded dataset-specific instructions ({len(instructions)} chars)")
-                return instructions
-            else:
-                logger.warning(f"No business_rules.md or llm_instructions.md found for dataset {dataset_id}, using generic instructions only")
-                return ""
-        except Exception as e:
-            logger.error(f"Error loading dataset instructions for {dataset_id}: {e}")
-            return ""
+class _RateLimiter:
+    """
+    Token buckets for requests/minute and input tokens/minute.
 
-    def _get_filter_instruction(self, client_id, dataset_id=None):
-        """
-        Get dataset-specific filtering instruction for SQL generation (config-driven).
-        Enhanced with emphatic corp_id requirement (Story: Query Expansion Architecture - Story 3).
+    Shared by every ClaudeService instance in the process so concurrent
+    requests stay under the account limits instead of hitting 429s.
+    """
 
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        """
         Args:
-            client_id (int): Client/Corporation ID
-            dataset_id (str, optional): Dataset identifier
+            requests_per_minute: Request budget; 0 or None means unlimited
+            tokens_per_minute: Input token budget; 0 or None means unlimited
 
-        Returns:
-            str: Filtering instruction for the LLM (with strong emphasis on security)
+        Raises:
+            ValueError: If a limit is negative or not a number
         """
-        if not dataset_id:
-            return f"""
+        self.requests_per_minute = self._validate_limit("requests_per_minute", requests_per_minute)
+        self.tokens_per_minute = self._validate_limit("input_tokens_per_minute", tokens_per_minute)
+        self._available_requests = float(self.requests_per_minute or 0)
+        self._available_tokens = float(self.tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _validate_limit(name, value):
+        """Return a per-minute limit, or None when it is unlimited (0 or None)."""
+        if value is None or value == 0:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"claude.{name} must be a positive number, or 0/null for no limit (got {value!r})")
+        return value
+
+    def acquire(self, tokens):
+        """Block until one request with ~tokens input tokens fits in both budgets."""
+        if self.requests_per_minute is None and self.tokens_per_minute is None:
+            return
+        if self.tokens_per_minute is not None:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._last_refill
+                self._last_refill = now
+                wait = 0.0
+                if self.requests_per_minute is not None:
+                    self._available_requests = min(
+                        self.requests_per_minute,
+                        self._available_requests + elapsed * self.requests_per_minute / 60.0
+                    )
+                    if self._available_requests < 1:
+                        wait = (1 - self._available_requests) * 60.0 / self.requests_per_minute
+                if self.tokens_per_minute is not None:
+                    self._available_tokens = min(
+                        self.tokens_per_minute,
+                        self._available_tokens + elapsed * self.tokens_per_minute / 60.0
+                    )
+                    if self._available_tokens < tokens:
+                        wait = max(wait, (tokens - self._available_tokens) * 60.0 / self.tokens_per_minute)
+                if wait == 0.0:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+            time.sleep(wait)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def _get_rate_limiter():
+    """Process-wide rate limiter built from Config on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = _RateLimiter(
+                    Config.CLAUDE_REQUESTS_PER_MINUTE, Config.CLAUDE_INPUT_TOKENS_PER_MINUTE
+                )
+    return _rate_limiter
+
+
+class _DatasetInstructions:
+    """
+    Dataset instructions split to fit Config.CLAUDE_MAX_INSTRUCTION_CHARS.
+
+    The leading sections that fit in half the cap are fixed: they go in the
+    prompt-cached system prefix. The remaining sections are candidates,
+    picked per query by IDF-weighted word overlap until the rest of the cap
+    is used, and sent in the uncached block.
+    """
+
+    def __init__(self, fixed, sections=(), budget=0):
+        self.fixed = fixed
+        self.budget = budget
+        # (content, word set) per candidate section, in file order
+        self.sections = tuple((content, frozenset(_WORD_RE.findall(content.lower())))
+                              for content in sections)
+        document_frequency = {}
+        for _, words in self.sections:
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        count = len(self.sections)
+        # Smoothed so a word in every candidate (or the only candidate) still scores
+        self.idf = {word: math.log(1 + count / df) for word, df in document_frequency.items()}
+
+    def select(self, query):
+        """Candidate sections relevant to query, in file order, within the budget."""
+        if not self.sections:
+            return ""
+
+        query_words = set(_WORD_RE.findall(query.lower()))
+        scored = []
+        for index, (_, words) in enumerate(self.sections):
+            score = sum(self.idf[word] for word in query_words & words)
+            if score > 0:
+                scored.append((score, index))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        picked = []
+        used = 0
+        for _, index in scored:
+            size = len(self.sections[index][0]) + len(SECTION_SEPARATOR)
+            if used + size <= self.budget:
+                picked.append(index)
+                used += size
+        return SECTION_SEPARATOR.join(self.sections[index][0] for index in sorted(picked))
+
+
+_NO_INSTRUCTIONS = _DatasetInstructions("")
+
+
+def _split_instructions(contents, max_chars):
+    """
+    Split instruction sections into a fixed prefix and per-query candidates.
+
+    Returns:
+        _DatasetInstructions: All sections fixed when they fit in max_chars
+    """
+    total = sum(len(content) for content in contents) + len(SECTION_SEPARATOR) * (len(contents) - 1)
+    if total <= max_chars:
+        return _DatasetInstructions(SECTION_SEPARATOR.join(contents))
+
+    fixed_count = 0
+    used = 0
+    for content in contents:
+        size = len(content) + len(SECTION_SEPARATOR)
+        if used + size > max_chars // 2:
+            break
+        fixed_count += 1
+        used += size
+
+    logger.info(f"Dataset instructions ({total} chars) exceed {max_chars}; "
+                f"{fixed_count} sections fixed, {len(contents) - fixed_count} selected per query")
+    return _DatasetInstructions(
+        SECTION_SEPARATOR.join(contents[:fixed_count]),
+        contents[fixed_count:],
+        budget=max_chars - used
+    )
+
+
+def _truncate_schema(schema, max_chars):
+    """Cut schema text to max_chars at a line boundary."""
+    if not schema or len(schema) <= max_chars:
+        return schema
+    cut = schema.rfind("\n", 0, max_chars)
+    logger.warning(f"Schema ({len(schema)} chars) truncated to {max_chars} chars")
+    return schema[:cut if cut > 0 else max_chars]
+
+
+@lru_cache(maxsize=32)
+def _load_dataset_instructions_cached(dataset_id):
+    """
+    Dataset-specific instructions from metadata, parsed once per process.
+
+    Errors propagate (and are not cached) so a transient failure is retried
+    by the next ClaudeService.
+
+    Returns:
+        _DatasetInstructions: Fixed instructions plus per-query candidate sections
+    """
+    # Only the instruction files are read, not the whole metadata directory
+    metadata_loader = MetadataLoader(dataset_id=dataset_id)
+    # Try business_rules first, fallback to llm_instructions for backward compatibility
+    docs = metadata_loader.get_documents_by_file('business_rules')
+    if not docs:
+        docs = metadata_loader.get_documents_by_file('llm_instructions')
+
+    if docs:
+        # Combine all sections, keeping the prompt within the configured cap
+        instructions = _split_instructions([doc.content for doc in docs], Config.CLAUDE_MAX_INSTRUCTION_CHARS)
+        logger.info(f"Loaded dataset-specific instructions ({len(instructions.fixed)} chars)")
+        return instructions
+
+    logger.warning(f"No business_rules.md or llm_instructions.md found for dataset {dataset_id}, using generic instructions only")
+    return _NO_INSTRUCTIONS
+
+
+def invalidate_dataset_cache():
+    """
+    Drop cached dataset instructions and metadata loaders so new
+    ClaudeService instances and agent tool calls re-read the metadata files
+    (admin flows after editing them; also run on Config.reload()).
+
+    Instances shared through ClaudeService.get() keep what they loaded until
+    ClaudeService.clear_instances(), which Config.reload() also runs.
+    """
+    _load_dataset_instructions_cached.cache_clear()
+    if load_dataset_metadata is not None:
+        load_dataset_metadata.cache_clear()
+
+
+Config.register_reload_hook(invalidate_dataset_cache)
+
+
+@lru_cache(maxsize=2048)
+def _build_filter_instruction(client_id, dataset_id=None):
+    """
+    Filtering instruction text per (client_id, dataset_id) - deterministic for a
+    given config, so it is built once (cleared on Config.reload()).
+    """
+    if not dataset_id:
+        return f"""
 🚨 CRITICAL SECURITY REQUIREMENT 🚨
 Data Isolation Filter: client_id = {client_id}
 
@@ -205,17 +423,17 @@ This is MANDATORY and NON-NEGOTIABLE for data security.
 Failure to include this will cause the query to be REJECTED by security validation.
 """
 
-        try:
-            dataset_config = Config.get_dataset(dataset_id)
+    try:
+        dataset_config = Config.get_dataset(dataset_id)
 
-            if 'client_isolation' in dataset_config:
-                client_iso = dataset_config['client_isolation']
-                method = client_iso.get('method', 'row-level')
-                filter_field = client_iso.get('filter_field', 'client_id')
+        if 'client_isolation' in dataset_config:
+            client_iso = dataset_config['client_isolation']
+            method = client_iso.get('method', 'row-level')
+            filter_field = client_iso.get('filter_field', 'client_id')
 
-                if method == 'brand-hierarchy':
-                    filter_table = client_iso.get('filter_table', 'Dim_Brand')
-                    return f"""
+            if method == 'brand-hierarchy':
+                filter_table = client_iso.get('filter_table', 'Dim_Brand')
+                return f"""
 🚨 CRITICAL SECURITY REQUIREMENT 🚨
 Brand Hierarchy Filtering: {filter_field} = {client_id}
 
@@ -226,8 +444,8 @@ EVERY query MUST filter through {filter_table}:
 This is MANDATORY. Queries without this filter will be REJECTED.
 See dataset-specific examples for hierarchy details.
 """
-                elif method == 'row-level':
-                    return f"""
+            elif method == 'row-level':
+                return f"""
 🚨 CRITICAL SECURITY REQUIREMENT 🚨
 Row-Level Filtering: {filter_field} = {client_id}
 
@@ -238,46 +456,181 @@ This is MANDATORY and NON-NEGOTIABLE for data security.
 Failure to include this will cause query REJECTION.
 """
 
-            # Default fallback
-            return f"""
+        # Default fallback
+        return f"""
 🚨 CRITICAL SECURITY REQUIREMENT 🚨
 WHERE client_id = {client_id}
 
 MUST be included in EVERY query. No exceptions.
 """
 
-        except Exception as e:
-            logger.warning(f"Error loading dataset config for {dataset_id}: {e}")
-            return f"""
+    except Exception as e:
+        logger.warning(f"Error loading dataset config for {dataset_id}: {e}")
+        return f"""
 🚨 CRITICAL SECURITY REQUIREMENT 🚨
 WHERE client_id = {client_id}
 
 MUST be included in EVERY query. No exceptions.
 """
 
-    def generate_sql(self, natural_language_query, client_id, client_name=None, custom_schema=None, dataset_id=None, conversation_context=None):
+
+def clear_filter_instruction_cache():
+    """Drop cached filter instructions (run on Config.reload())."""
+    _build_filter_instruction.cache_clear()
+
+
+Config.register_reload_hook(clear_filter_instruction_cache)
+
+
+class ClaudeService:
+    """
+    Service for interacting with Claude API to generate SQL queries.
+
+    Instances are safe to share between threads: the Anthropic client is
+    thread-safe, and the per-instance template cache is a dict that is cleared
+    once it holds SYSTEM_PROMPT_CACHE_SIZE templates - a lookup racing the
+    clear only rebuilds its template.
+    Use ClaudeService.get() to reuse one instance (and its HTTP connection
+    pool and prompt templates) per dataset.
+    """
+
+    _INSTANCES: ClassVar[Dict[Tuple[Optional[str], Optional[str]], "ClaudeService"]] = {}
+    _INSTANCES_LOCK: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get(cls, dataset_id=None, api_key=None):
         """
-        Generate SQL query from natural language using Claude API.
-        Story: STORY-001 - Conversation Context for Follow-Up Queries
+        Shared ClaudeService for a dataset (created on first use).
 
         Args:
-            natural_language_query (str): User's natural language query
-            client_id (int): Client ID for data isolation
-            client_name (str, optional): Client name for additional context
-            custom_schema (str, optional): Custom database schema (overrides default)
-            dataset_id (str, optional): Dataset identifier for dataset-specific instructions
-            conversation_context (str, optional): Formatted conversation history for follow-up queries (STORY-001)
+            dataset_id (str, optional): Dataset ID for loading metadata
+            api_key (str, optional): Anthropic API key. Uses Config.ANTHROPIC_API_KEY if None.
 
         Returns:
-            str: Generated SQL query
+            ClaudeService: The cached instance for (dataset_id, api_key)
+        """
+        key = (dataset_id, api_key)
+        instance = cls._INSTANCES.get(key)
+        if instance is None:
+            with cls._INSTANCES_LOCK:
+                instance = cls._INSTANCES.get(key)
+                if instance is None:
+                    instance = cls(api_key=api_key, dataset_id=dataset_id)
+                    cls._INSTANCES[key] = instance
+        return instance
+
+    @classmethod
+    def clear_instances(cls):
+        """Drop the shared instances so the next get() builds a fresh one."""
+        with cls._INSTANCES_LOCK:
+            cls._INSTANCES.clear()
 
-        Raises:
-            APITimeoutError: If Claude API times out
-            APIError: If Claude API returns an error
-            ValueError: If generated SQL is invalid
+    def __init__(self, api_key=None, dataset_id=None):
         """
-        logger.info(f"Generating SQL for client_id={client_id}, dataset={dataset_id}, query='{natural_language_query[:100]}'")
+        Initialize Claude service with hybrid instruction loading.
+
+        Args:
+            api_key (str, optional): Anthropic API key. Uses Config.ANTHROPIC_API_KEY if None.
+            dataset_id (str, optional): Dataset ID for loading metadata
+        """
+        self.api_key = api_key or Config.ANTHROPIC_API_KEY
+
+        if not self.api_key:
+            raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY in .env file.")
+
+        self.client = Anthropic(api_key=self.api_key)
+        self.model = Config.CLAUDE_MODEL
+        self.max_tokens = Config.CLAUDE_MAX_TOKENS
+        self.timeout = Config.CLAUDE_TIMEOUT
+
+        # Load dataset-specific instructions from metadata
+        self.dataset_id = dataset_id
+        self._dataset_instructions = self._load_dataset_instructions(dataset_id)
+        self.dataset_specific_instructions = self._dataset_instructions.fixed
+
+        # System prompt templates keyed by (custom_schema, dataset_id); the
+        # default (no custom schema) template is built up front
+        self._system_prompt_cache = {}
+        self._system_prompt_template(None, dataset_id)
+
+        logger.info(f"Claude service initialized with model: {self.model}, dataset: {dataset_id}")
+
+    def _load_dataset_instructions(self, dataset_id):
+        """Load dataset-specific instructions from metadata (hybrid approach)."""
+        if not dataset_id:
+            logger.warning("No dataset_id provided, no dataset-specific instructions loaded")
+            return _NO_INSTRUCTIONS
+
+        if not MetadataLoader:
+            logger.warning("MetadataLoader not available, using generic instructions only")
+            return _NO_INSTRUCTIONS
+
+        try:
+            return _load_dataset_instructions_cached(dataset_id)
+        except Exception as e:
+            logger.error(f"Error loading dataset instructions for {dataset_id}: {e}")
+            return _NO_INSTRUCTIONS
+
+    def _get_filter_instruction(self, client_id, dataset_id=None):
+        """
+        Get dataset-specific filtering instruction for SQL generation (config-driven).
+        Enhanced with emphatic corp_id requirement (Story: Query Expansion Architecture - Story 3).
+
+        Args:
+            client_id (int): Client/Corporation ID
+            dataset_id (str, optional): Dataset identifier
+
+        Returns:
+            str: Filtering instruction for the LLM (with strong emphasis on security)
+        """
+        return _build_filter_instruction(client_id, dataset_id)
+
+    def _system_prompt_template(self, custom_schema, dataset_id):
+        """
+        Build (or reuse) the system prompt for a schema/dataset pair.
+
+        Both sections are pre-split on CLIENT_ID_PLACEHOLDER, so filling in
+        the client ID is a single join instead of a search over the prompt.
+
+        Returns:
+            tuple: (shared prefix pieces - rules, schema, dataset patterns and
+                visualization instructions, identical for every client, so it
+                is the prompt-cached block; client section pieces). Join each
+                with the client ID; conversation context is appended to the
+                client section.
+        """
+        key = (custom_schema, dataset_id)
+        template = self._system_prompt_cache.get(key)
+        if template is not None:
+            return template
+
+        # Build hybrid system prompt - schema, dataset patterns and visualization
+        # instructions in one render; this is the static, prompt-cached prefix
+        shared_prefix = SYSTEM_PROMPT_TEMPLATE.render(
+            schema=_truncate_schema(custom_schema, Config.CLAUDE_MAX_SCHEMA_CHARS),
+            dataset_instructions=self.dataset_specific_instructions,
+            visualization_instructions=VISUALIZATION_INSTRUCTIONS
+        )
+
+        # Add runtime filter instruction (client ID stays a placeholder)
+        filter_instruction = self._get_filter_instruction(CLIENT_ID_PLACEHOLDER, dataset_id)
+        client_section = f"\n## Client Filtering Requirement\n\n{filter_instruction}\n\n"
+
+        template = (tuple(shared_prefix.split(CLIENT_ID_PLACEHOLDER)),
+                    tuple(client_section.split(CLIENT_ID_PLACEHOLDER)))
+
+        if len(self._system_prompt_cache) >= SYSTEM_PROMPT_CACHE_SIZE:
+            self._system_prompt_cache.clear()
+        self._system_prompt_cache[key] = template
+        return template
 
+    def _build_prompts(self, natural_language_query, client_id, client_name=None, custom_schema=None, dataset_id=None, conversation_context=None):
+        """
+        Build the system blocks and user prompt for one SQL generation request.
+
+        Returns:
+            tuple: (system content blocks, user prompt str)
+        """
         # Build user prompt with client context
         user_prompt = f"""Client Context: client_id = {client_id}"""
         if client_name:
@@ -289,69 +642,189 @@ Natural Language Query: {natural_language_query}
 
 Generate the SQL query:"""
 
-        # Build hybrid system prompt
-        system_prompt = BASE_LLM_INSTRUCTIONS
-
-        # Add database schema
-        if custom_schema:
-            system_prompt = system_prompt.replace(
-                "{DYNAMIC_SCHEMA_PLACEHOLDER}",
-                f"\n## Database Schema\n\n{custom_schema}\n"
-            )
-        else:
-            system_prompt = system_prompt.replace("{DYNAMIC_SCHEMA_PLACEHOLDER}", "")
-
-        # Add dataset-specific instructions (examples, patterns)
-        if self.dataset_specific_instructions:
-            system_prompt = system_prompt.replace(
-                "{DATASET_SPECIFIC_INSTRUCTIONS}",
-                f"\n## Dataset-Specific Patterns\n\n{self.dataset_specific_instructions}\n"
-            )
-        else:
-            system_prompt = system_prompt.replace("{DATASET_SPECIFIC_INSTRUCTIONS}", "")
-
-        # Add runtime filter instruction
-        filter_instruction = self._get_filter_instruction(client_id, dataset_id or self.dataset_id)
-        system_prompt = system_prompt.replace(
-            "{FILTER_INSTRUCTION}",
-            f"\n## Client Filtering Requirement\n\n{filter_instruction}\n"
+        # Cached schema/dataset/filter prompt; only the client ID is filled in per call
+        prefix_pieces, client_pieces = self._system_prompt_template(
+            custom_schema, dataset_id or self.dataset_id
         )
+        client_id_text = str(client_id)
+        client_prompt = client_id_text.join(client_pieces)
+        # Usually the prefix has no placeholder (one piece) and is used as-is
+        shared_prefix = prefix_pieces[0] if len(prefix_pieces) == 1 else client_id_text.join(prefix_pieces)
+
+        # Dataset sections over the cached prefix's cap, picked for this query
+        relevant_instructions = self._dataset_instructions.select(natural_language_query)
+        if relevant_instructions:
+            client_prompt += f"\n## Additional Dataset Patterns\n\n{relevant_instructions}\n"
 
         # NEW: Add conversation context (STORY-001, AC2)
         if conversation_context:
-            system_prompt += f"\n{conversation_context}\n"
+            client_prompt += f"\n{conversation_context}\n"
             logger.info(f"Added conversation context to prompt ({len(conversation_context)} chars)")
 
-        # Add visualization instructions
-        system_prompt += f"\n{VISUALIZATION_INSTRUCTIONS}\n"
+        # Schema + instructions are the cached prefix; the per-client part follows uncached
+        system_blocks = [
+            {"type": "text", "text": shared_prefix, "cache_control": PROMPT_CACHE_CONTROL},
+            {"type": "text", "text": client_prompt}
+        ]
+
+        return system_blocks, user_prompt
+
+    @staticmethod
+    def _parse_response(content):
+        """
+        Split Claude's response content into SQL text and chart metadata.
+
+        Returns:
+            tuple: (SQL query str, chart metadata dict or None)
+        """
+        # Extract SQL text and the chart metadata tool input from the content blocks
+        text_parts = []
+        chart_metadata = None
+        for block in content:
+            if block.type == "text":
+                text_parts.append(block.text)
+            elif block.type == "tool_use" and block.name == CHART_METADATA_TOOL["name"]:
+                chart_metadata = dict(block.input)
+        sql_query = "".join(text_parts).strip()
+
+        # Clean up any markdown code blocks if present (substring check skips clean responses)
+        if '```' in sql_query:
+            sql_query = _FENCE_RE.sub('', sql_query).strip()
+
+        return sql_query, chart_metadata
+
+    def generate_sql(self, natural_language_query, client_id, client_name=None, custom_schema=None, dataset_id=None, conversation_context=None, no_cache=False):
+        """
+        Generate SQL query from natural language using Claude API.
+        Story: STORY-001 - Conversation Context for Follow-Up Queries
+
+        Same as generate_sql_with_chart_metadata() without the chart metadata.
+
+        Returns:
+            str: Generated SQL query
+        """
+        sql_query, _ = self.generate_sql_with_chart_metadata(
+            natural_language_query, client_id, client_name=client_name,
+            custom_schema=custom_schema, dataset_id=dataset_id,
+            conversation_context=conversation_context, no_cache=no_cache
+        )
+        return sql_query
+
+    def generate_sql_with_chart_metadata(self, natural_language_query, client_id, client_name=None, custom_schema=None, dataset_id=None, conversation_context=None, no_cache=False):
+        """
+        Generate SQL query and chart metadata from natural language using Claude API.
+        Story: STORY-001 - Conversation Context for Follow-Up Queries
+
+        Same as generate_sql_stream(), consumed to completion.
+
+        Returns:
+            tuple: (SQL query str, chart metadata dict from the emit_chart_metadata
+                tool call, or None if Claude did not call the tool)
+        """
+        stream = self.generate_sql_stream(
+            natural_language_query, client_id, client_name=client_name,
+            custom_schema=custom_schema, dataset_id=dataset_id,
+            conversation_context=conversation_context, no_cache=no_cache
+        )
+        try:
+            while True:
+                next(stream)
+        except StopIteration as done:
+            return done.value
+
+    def generate_sql_stream(self, natural_language_query, client_id, client_name=None, custom_schema=None, dataset_id=None, conversation_context=None, no_cache=False):
+        """
+        Stream SQL generation from Claude, yielding text as it arrives.
+        Story: STORY-001 - Conversation Context for Follow-Up Queries
+
+        Callers can start showing or checking the SQL at time-to-first-token
+        instead of waiting for the full response. Chunks are the raw model
+        text (fences not yet stripped); the generator's return value
+        (StopIteration.value / ``yield from``) is the cleaned result.
+
+        Args:
+            natural_language_query (str): User's natural language query
+            client_id (int): Client ID for data isolation
+            client_name (str, optional): Client name for additional context
+            custom_schema (str, optional): Custom database schema (overrides default)
+            dataset_id (str, optional): Dataset identifier for dataset-specific instructions
+            conversation_context (str, optional): Formatted conversation history for follow-up queries (STORY-001)
+            no_cache (bool): Skip the semantic cache lookup (results are
+                stored separately through cache_result())
+
+        Yields:
+            str: Response text chunks (a semantic cache hit yields the cached SQL once)
+
+        Returns:
+            tuple: (SQL query str, chart metadata dict from the emit_chart_metadata
+                tool call, or None if Claude did not call the tool)
+
+        Raises:
+            APITimeoutError: If Claude API times out
+            APIError: If Claude API returns an error
+            ValueError: If generated SQL is invalid
+        """
+        logger.info(f"Generating SQL for client_id={client_id}, dataset={dataset_id}, query='{natural_language_query[:100]}'")
+
+        # Near-duplicate questions reuse earlier SQL; follow-ups and revisions
+        # depend on their conversation context, so they always go to Claude
+        semantic_cache = None if no_cache or conversation_context else get_semantic_cache()
+        if semantic_cache is not None:
+            cached = semantic_cache.lookup(
+                self._semantic_cache_namespace(client_id, custom_schema, dataset_id),
+                natural_language_query
+            )
+            if cached is not None:
+                yield cached[0]
+                return cached
+
+        system_blocks, user_prompt = self._build_prompts(
+            natural_language_query, client_id, client_name=client_name,
+            custom_schema=custom_schema, dataset_id=dataset_id,
+            conversation_context=conversation_context
+        )
 
-        # Replace client_id placeholders in examples
-        system_prompt = system_prompt.replace("{client_id}", str(client_id))
+        # The cached prefix does not count toward the input token limit
+        uncached_chars = len(system_blocks[1]["text"]) + len(user_prompt)
+        _get_rate_limiter().acquire(uncached_chars // CHARS_PER_TOKEN)
 
         try:
-            # Call Claude API
-            message = self.client.messages.create(
+            # Call Claude API (streamed - the SQL text is passed on while the
+            # chart metadata tool call is still being generated)
+            start_time = time.perf_counter()
+            first_token_time = None
+            with self.client.messages.stream(
                 model=self.model,
                 max_tokens=self.max_tokens,
                 timeout=self.timeout,
-                system=system_prompt,
+                system=system_blocks,
+                tools=[CHART_METADATA_TOOL],
+                extra_headers=PROMPT_CACHING_HEADERS,
                 messages=[
                     {"role": "user", "content": user_prompt}
                 ]
-            )
-
-            # Extract SQL from response
-            sql_query = message.content[0].text.strip()
-
-            # Clean up any markdown code blocks if present
-            if sql_query.startswith('```'):
-                # Remove markdown code blocks
-                lines = sql_query.split('\n')
-                sql_query = '\n'.join(line for line in lines if not line.startswith('```'))
-                sql_query = sql_query.strip()
+            ) as stream:
+                for text in stream.text_stream:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start_time
+                    yield text
+                message = stream.get_final_message()
+
+            if first_token_time is not None:
+                logger.info(f"Claude first token in {first_token_time:.2f}s, "
+                            f"complete in {time.perf_counter() - start_time:.2f}s")
+
+            # Prompt cache effectiveness (fields absent on SDKs without caching support)
+            usage = getattr(message, "usage", None)
+            if usage is not None:
+                logger.info(f"Prompt cache: read={getattr(usage, 'cache_read_input_tokens', None)}, "
+                            f"created={getattr(usage, 'cache_creation_input_tokens', None)}, "
+                            f"uncached input={getattr(usage, 'input_tokens', None)}")
+
+            sql_query, chart_metadata = self._parse_response(message.content)
 
             logger.info(f"Generated SQL: {sql_query[:200]}...")
-            return sql_query
+            return sql_query, chart_metadata
 
         except APITimeoutError as e:
             logger.error(f"Claude API timeout: {e}")
@@ -365,6 +838,123 @@ Generate the SQL query:"""
             logger.error(f"Unexpected error generating SQL: {e}")
             raise ValueError(f"Unexpected error: {str(e)}") from e
 
+    def _semantic_cache_namespace(self, client_id, custom_schema=None, dataset_id=None):
+        """Semantic cache partition for a dataset, client and schema."""
+        schema_digest = hashlib.sha1((custom_schema or "").encode("utf-8")).hexdigest()
+        return f"{dataset_id or self.dataset_id}:{client_id}:{schema_digest}"
+
+    def cache_result(self, natural_language_query, client_id, sql_query, chart_metadata=None, custom_schema=None, dataset_id=None):
+        """
+        Store SQL in the semantic cache once it has passed validation and executed.
+
+        generate_sql_stream() only looks the cache up; storing is left to the
+        caller so SQL that fails validation or execution is never served again.
+        Arguments must match the ones the SQL was generated with, and the
+        generation must not have used conversation context.
+
+        Args:
+            natural_language_query (str): User's natural language query
+            client_id (int): Client ID the SQL was generated for
+            sql_query (str): Validated, successfully executed SQL
+            chart_metadata (dict, optional): Chart metadata from the same generation
+            custom_schema (str, optional): Schema passed to generation
+            dataset_id (str, optional): Dataset passed to generation
+        """
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is None or not sql_query:
+            return
+        semantic_cache.store(
+            self._semantic_cache_namespace(client_id, custom_schema, dataset_id),
+            natural_language_query, sql_query, chart_metadata
+        )
+
+    def generate_sql_many(self, items, max_workers=8):
+        """
+        Generate SQL for several queries concurrently.
+
+        Requests run on a thread pool under the shared rate limiter, so N
+        generations take roughly the slowest one instead of the sum.
+
+        Args:
+            items (list[dict]): One dict per query with the generate_sql() keyword arguments
+            max_workers (int): Maximum concurrent Claude requests
+
+        Returns:
+            list: SQL query strings in the order of items
+
+        Raises:
+            ValueError: If any generation fails
+        """
+        if not items:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items)),
+                                thread_name_prefix="claude-sql") as pool:
+            return list(pool.map(lambda item: self.generate_sql(**item), items))
+
+    def generate_sql_batch(self, items):
+        """
+        Generate SQL for many queries through the Message Batches API.
+
+        For bulk, latency-insensitive workloads (evaluations, backfills, dashboard
+        warm-ups): one batch submission at half the per-token cost instead of one
+        round-trip per query. Blocks until the batch has ended.
+
+        Args:
+            items (list[dict]): One dict per query with the generate_sql() keyword
+                arguments (natural_language_query, client_id, and optionally
+                client_name, custom_schema, dataset_id, conversation_context)
+
+        Returns:
+            list: SQL query strings in the order of items; None for requests
+                that errored, were canceled or expired
+
+        Raises:
+            ValueError: If the batch cannot be submitted or polled
+        """
+        if not items:
+            return []
+
+        requests = []
+        for index, item in enumerate(items):
+            system_blocks, user_prompt = self._build_prompts(**item)
+            requests.append({
+                "custom_id": f"query-{index}",
+                "params": {
+                    "model": self.model,
+                    "max_tokens": self.max_tokens,
+                    "system": system_blocks,
+                    "tools": [CHART_METADATA_TOOL],
+                    "messages": [{"role": "user", "content": user_prompt}]
+                }
+            })
+
+        batches = self.client.beta.messages.batches
+        betas = [PROMPT_CACHING_HEADERS["anthropic-beta"]]
+
+        try:
+            batch = batches.create(requests=requests, betas=betas)
+            logger.info(f"Submitted message batch {batch.id} with {len(requests)} requests")
+
+            while batch.processing_status != "ended":
+                time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+                batch = batches.retrieve(batch.id)
+                logger.info(f"Message batch {batch.id}: {batch.request_counts}")
+
+            sql_queries = [None] * len(items)
+            for entry in batches.results(batch.id, betas=betas):
+                index = int(entry.custom_id.rsplit("-", 1)[1])
+                if entry.result.type == "succeeded":
+                    sql_queries[index], _ = self._parse_response(entry.result.message.content)
+                else:
+                    logger.warning(f"Batch request {entry.custom_id} {entry.result.type}")
+
+            return sql_queries
+
+        except APIError as e:
+            logger.error(f"Claude batch API error: {e}")
+            raise ValueError(f"Failed to generate SQL batch: {str(e)}") from e
+
     def get_schema_info(self):
         """
         Get database schema information.
@@ -373,3 +963,6 @@ Generate the SQL query:"""
             str: Base LLM instructions (schema should be provided dynamically)
         """
         return "Schema should be fetched dynamically from database. Use custom_schema parameter in generate_sql()."
+
+
+Config.register_reload_hook(ClaudeService.clear_instances)
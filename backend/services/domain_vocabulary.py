@@ -5,17 +5,74 @@ Automatically extracts domain-specific keywords from database schema.
 Used for follow-up detection and clarification detection in agentic text-to-SQL service.
 """
 
+import json
+import os
+from dataclasses import dataclass
 import sqlite3
 import re
 import logging
-from typing import Dict, List, Set
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set
 from pathlib import Path
 
+from services.query_executor import apply_read_pragmas, sqlite_read_only_uri
+
 logger = logging.getLogger(__name__)
 
 # Module-level cache to avoid repeated schema queries
 _vocabulary_cache = {}
 
+# Table name prefixes (Fact_, Dim_, fact_, dim_) stripped before entity extraction (lowercase)
+_TABLE_PREFIXES = ('fact_', 'dim_')
+
+# Generic entities every dataset understands
+_STATIC_ENTITIES = frozenset({'data', 'records', 'report', 'reports'})
+
+# Column name suffixes stripped before word extraction
+_SUFFIX_RE = re.compile(r'_(id|usd|m|k|pct|percent|flag)$')
+
+# Common synonyms for metric words found in column names
+_METRIC_SYNONYMS = {
+    'value': ('revenue', 'sales', 'amount'),
+    'qty': ('quantity', 'volume'),
+    'amt': ('amount',),
+    'sold': ('sales',),
+    'count': ('total', 'number')
+}
+
+# Numeric SQL type names (matched against the words of a declared column type)
+_NUMERIC_TYPES = frozenset({
+    'INTEGER', 'INT', 'BIGINT', 'SMALLINT', 'TINYINT', 'MEDIUMINT',
+    'REAL', 'NUMERIC', 'DECIMAL', 'FLOAT', 'DOUBLE'
+})
+
+# Every column of every table, ordered by table (pragma_table_info needs SQLite 3.16+)
+SCHEMA_COLUMNS_QUERY = """
+    SELECT m.name, p.name, p.type
+    FROM sqlite_master m
+    JOIN pragma_table_info(m.name) p
+    WHERE m.type = 'table'
+    ORDER BY m.name, p.cid
+"""
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    """Dataset vocabulary as frozensets, built once per dataset for O(1) membership tests."""
+
+    entities: FrozenSet[str]
+    metrics: FrozenSet[str]
+    dimensions: FrozenSet[str]
+
+    @classmethod
+    def from_vocabulary(cls, vocabulary: Dict[str, List[str]]) -> "CompiledSchema":
+        """Build from a get_vocabulary() dict."""
+        return cls(
+            entities=frozenset(vocabulary.get("entities", ())),
+            metrics=frozenset(vocabulary.get("metrics", ())),
+            dimensions=frozenset(vocabulary.get("dimensions", ()))
+        )
+
 
 class DomainVocabularyExtractor:
     """Extract domain-specific vocabulary from database schema."""
@@ -53,50 +110,42 @@ class DomainVocabularyExtractor:
 
         try:
             # Connect to database
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(sqlite_read_only_uri(self.db_path), uri=True)
+            apply_read_pragmas(conn)
             cursor = conn.cursor()
 
-            # Get all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-            tables = [row[0] for row in cursor.fetchall()]
-
-            logger.debug(f"Found {len(tables)} tables in schema")
-
-            # Extract entities from table names
-            entities = self._extract_entities(tables)
+            # All (table, column, type) rows in one statement instead of one PRAGMA per table
+            cursor.execute(SCHEMA_COLUMNS_QUERY)
+            rows = cursor.fetchall()
+            conn.close()
 
             # Extract metrics and dimensions from columns
+            tables = []
             metrics = set()
             dimensions = set()
 
-            for table in tables:
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
-
-                # Determine if this is a dimension table
-                is_dimension_table = table.lower().startswith('dim_')
+            for table, col_name, col_type in rows:
+                if not tables or tables[-1] != table:
+                    tables.append(table)
 
-                for col_info in columns:
-                    col_name = col_info[1]  # Column name
-                    col_type = col_info[2]  # Column type
+                # Extract metrics from numeric columns
+                if self._is_numeric_type(col_type):
+                    metrics |= self._extract_words_from_column(col_name)
 
-                    # Extract metrics from numeric columns
-                    if self._is_numeric_type(col_type):
-                        metric_words = self._extract_words_from_column(col_name)
-                        metrics.update(metric_words)
+                # Extract dimensions from dimension table columns
+                if table.lower().startswith('dim_'):
+                    dimensions |= self._extract_words_from_column(col_name)
 
-                    # Extract dimensions from dimension table columns
-                    if is_dimension_table:
-                        dimension_words = self._extract_words_from_column(col_name)
-                        dimensions.update(dimension_words)
+            logger.debug(f"Found {len(tables)} tables in schema")
 
-            conn.close()
+            # Extract entities from table names
+            entities = self._extract_entities(tables)
 
             # Convert to sorted lists
             vocabulary = {
-                "entities": sorted(list(entities)),
-                "metrics": sorted(list(metrics)),
-                "dimensions": sorted(list(dimensions))
+                "entities": sorted(entities),
+                "metrics": sorted(metrics),
+                "dimensions": sorted(dimensions)
             }
 
             logger.info(f"Extracted vocabulary: {len(vocabulary['entities'])} entities, "
@@ -122,48 +171,68 @@ class DomainVocabularyExtractor:
         Returns:
             Set of entity keywords (singular and plural forms)
         """
-        entities = set()
+        # Start from the common generic entities
+        entities = set(_STATIC_ENTITIES)
 
         for table in tables:
-            # Remove common prefixes (Fact_, Dim_, fact_, dim_)
-            clean_name = re.sub(r'^(Fact_|Dim_|fact_|dim_)', '', table, flags=re.IGNORECASE)
+            entities |= self._extract_words_from_table(table)
+
+        return entities
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _extract_words_from_table(table: str) -> FrozenSet[str]:
+        """
+        Extract entity keywords from one table name (cached per name).
+
+        Args:
+            table: Table name (e.g., "Dim_Category")
 
-            # Convert snake_case to words
-            words = clean_name.lower().split('_')
+        Returns:
+            Frozenset of singular and plural forms
+        """
+        entities = set()
 
-            for word in words:
-                if len(word) > 2:  # Skip very short words
-                    # Add singular form
-                    entities.add(word)
+        # Remove common prefixes (Fact_, Dim_, fact_, dim_)
+        clean_name = table.lower()
+        if clean_name.startswith(_TABLE_PREFIXES):
+            clean_name = clean_name[clean_name.find('_') + 1:]
 
-                    # Add plural form (simple pluralization)
-                    if not word.endswith('s'):
-                        entities.add(word + 's')
+        # Convert snake_case to words
+        for word in clean_name.split('_'):
+            if len(word) > 2:  # Skip very short words
+                # Add singular form
+                entities.add(word)
+
+                last = word[-1]
+                # Add plural form (simple pluralization)
+                if last != 's':
+                    entities.add(word + 's')
 
                     # Handle special cases
-                    if word.endswith('y') and len(word) > 3:
+                    if last == 'y' and len(word) > 3:
                         # category → categories
                         entities.add(word[:-1] + 'ies')
 
-        # Add common generic entities
-        entities.update(['data', 'records', 'report', 'reports'])
-
-        return entities
+        return frozenset(entities)
 
-    def _extract_words_from_column(self, col_name: str) -> Set[str]:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _extract_words_from_column(col_name: str) -> FrozenSet[str]:
         """
-        Extract meaningful words from a column name.
+        Extract meaningful words from a column name (cached per name - common
+        columns recur across tables and datasets).
 
         Args:
             col_name: Column name (e.g., "value_sold_usd", "market_value")
 
         Returns:
-            Set of extracted words
+            Frozenset of extracted words
         """
         words = set()
 
         # Remove common suffixes
-        clean_name = re.sub(r'_(id|usd|m|k|pct|percent|flag)$', '', col_name.lower())
+        clean_name = _SUFFIX_RE.sub('', col_name.lower())
 
         # Split by underscore
         parts = clean_name.split('_')
@@ -173,19 +242,11 @@ class DomainVocabularyExtractor:
                 words.add(part)
 
         # Add common synonyms for metrics
-        synonym_map = {
-            'value': ['revenue', 'sales', 'amount'],
-            'qty': ['quantity', 'volume'],
-            'amt': ['amount'],
-            'sold': ['sales'],
-            'count': ['total', 'number']
-        }
-
         for word in list(words):
-            if word in synonym_map:
-                words.update(synonym_map[word])
+            if word in _METRIC_SYNONYMS:
+                words.update(_METRIC_SYNONYMS[word])
 
-        return words
+        return frozenset(words)
 
     def _is_numeric_type(self, col_type: str) -> bool:
         """
@@ -197,8 +258,10 @@ class DomainVocabularyExtractor:
         Returns:
             True if numeric type
         """
-        numeric_types = ['INTEGER', 'REAL', 'NUMERIC', 'DECIMAL', 'FLOAT', 'DOUBLE']
-        return any(t in col_type.upper() for t in numeric_types)
+        # Type name words without the size suffix: "DECIMAL(10,2)" -> ["DECIMAL"],
+        # "DOUBLE PRECISION" -> ["DOUBLE", "PRECISION"]
+        type_words = col_type.upper().split('(', 1)[0].split()
+        return not _NUMERIC_TYPES.isdisjoint(type_words)
 
     def _get_fallback_vocabulary(self) -> Dict[str, List[str]]:
         """
@@ -220,6 +283,10 @@ def get_vocabulary(dataset_id: str, db_path: str) -> Dict[str, List[str]]:
     """
     Get domain vocabulary with caching.
 
+    Extracted vocabulary is also persisted to a JSON sidecar next to the
+    database (<db>.vocab.json) and reused by new processes until the
+    database file's mtime changes.
+
     Args:
         dataset_id: Dataset identifier
         db_path: Path to database file
@@ -230,18 +297,78 @@ def get_vocabulary(dataset_id: str, db_path: str) -> Dict[str, List[str]]:
     cache_key = f"{dataset_id}:{db_path}"
 
     if cache_key not in _vocabulary_cache:
-        logger.info(f"Loading vocabulary for dataset: {dataset_id} (not in cache)")
-        extractor = DomainVocabularyExtractor(dataset_id, db_path)
-        _vocabulary_cache[cache_key] = extractor.extract_vocabulary()
+        vocabulary = _load_sidecar(db_path)
+        if vocabulary is None:
+            logger.info(f"Loading vocabulary for dataset: {dataset_id} (not in cache)")
+            extractor = DomainVocabularyExtractor(dataset_id, db_path)
+            vocabulary = extractor.extract_vocabulary()
+            # Only a successful extraction is persisted, never the fallback
+            if extractor._cache is not None:
+                _write_sidecar(db_path, vocabulary)
+        else:
+            logger.info(f"Loaded vocabulary for dataset: {dataset_id} from {_sidecar_path(db_path).name}")
+        _vocabulary_cache[cache_key] = vocabulary
     else:
         logger.debug(f"Using cached vocabulary for dataset: {dataset_id}")
 
     return _vocabulary_cache[cache_key]
 
 
-def clear_cache():
-    """Clear the vocabulary cache. Useful for testing."""
+def _sidecar_path(db_path: str) -> Path:
+    """Vocabulary sidecar file stored next to the database."""
+    return Path(db_path).with_suffix('.vocab.json')
+
+
+def _load_sidecar(db_path: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Read the persisted vocabulary for db_path.
+
+    Returns:
+        Vocabulary dict, or None if there is no sidecar or the database
+        changed since it was written
+    """
+    try:
+        mtime = os.stat(db_path).st_mtime
+        with open(_sidecar_path(db_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("mtime") != mtime:
+        return None
+    return data.get("vocab")
+
+
+def _write_sidecar(db_path: str, vocabulary: Dict[str, List[str]]) -> None:
+    """Persist vocabulary next to db_path, keyed by the database mtime."""
+    sidecar = _sidecar_path(db_path)
+    tmp_path = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+    try:
+        mtime = os.stat(db_path).st_mtime
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"mtime": mtime, "vocab": vocabulary}, f)
+        # Atomic swap so concurrent workers never read a partial file
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        logger.warning(f"Could not write vocabulary cache {sidecar}: {e}")
+
+
+def clear_cache(remove_sidecars: bool = False):
+    """
+    Clear the vocabulary cache. Useful for testing.
+
+    Args:
+        remove_sidecars: Also delete the persisted vocabulary files of the
+            databases that were cached in this process
+    """
     global _vocabulary_cache
+    if remove_sidecars:
+        for cache_key in _vocabulary_cache:
+            db_path = cache_key.split(':', 1)[1]
+            try:
+                _sidecar_path(db_path).unlink()
+            except FileNotFoundError:
+                pass
     _vocabulary_cache = {}
     logger.info("Vocabulary cache cleared")
 
@@ -7,8 +7,9 @@ and makes them available for retrieval and context augmentation.
 
 import os
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 import re
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,18 @@ logger = logging.getLogger(__name__)
 # Project root
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 
+# Markdown heading lines that start a new section, per parsing strategy (title in group 1)
+_RULE_HEADING_RE = re.compile(r'#{2,}[ \t]+RULE:[ \t]+(.+)')
+_PATTERN_HEADING_RE = re.compile(r'#{3,}[ \t]+(.+)')
+_SECTION_HEADING_RE = re.compile(r'#{2,}[ \t]+(.+)')
+_TITLE_RE = re.compile(r'#\s+([^\n]+)')
+
+# Section strategy per metadata file: (heading pattern, section name prefix,
+# heading written back into the section content, document type, title metadata key)
+_BUSINESS_RULES_STYLE = (_RULE_HEADING_RE, "rule_", "# RULE: ", "business_rule", "rule_title")
+_QUERY_PATTERNS_STYLE = (_PATTERN_HEADING_RE, "pattern_", "### ", "query_pattern", "pattern_title")
+_TABLE_SCHEMA_STYLE = (_SECTION_HEADING_RE, "", "## ", "table_metadata", "section_title")
+
 
 class MetadataDocument:
     """Represents a single metadata document chunk."""
@@ -33,6 +46,14 @@ class MetadataDocument:
         self.section = section
         self.content = content
         self.metadata = metadata or {}
+        self._content_lower = None
+    
+    @property
+    def content_lower(self) -> str:
+        """Lowercased content, computed on first use (for case-insensitive search)."""
+        if self._content_lower is None:
+            self._content_lower = self.content.lower()
+        return self._content_lower
     
     def to_dict(self) -> Dict:
         """Convert to dictionary representation."""
@@ -63,6 +84,10 @@ class MetadataLoader:
         self.metadata_root = metadata_root or (PROJECT_ROOT / "metadata")
         self.dataset_metadata_dir = self.metadata_root / dataset_id
         self.documents: List[MetadataDocument] = []
+        self._loaded = False
+        # Documents by metadata type and by file name, built by load_all()
+        self._by_type: Dict[str, List[MetadataDocument]] = {}
+        self._by_file: Dict[str, List[MetadataDocument]] = {}
         
         logger.info(f"Initialized MetadataLoader for dataset: {dataset_id}")
         logger.info(f"Metadata directory: {self.dataset_metadata_dir}")
@@ -78,23 +103,40 @@ class MetadataLoader:
             logger.warning(f"Metadata directory not found: {self.dataset_metadata_dir}")
             return []
         
-        self.documents = []
-        
-        # Load all .md files in dataset directory
-        md_files = list(self.dataset_metadata_dir.glob("*.md"))
-        logger.info(f"Found {len(md_files)} metadata files for {self.dataset_id}")
-        
-        for md_file in md_files:
-            try:
-                docs = self._parse_markdown_file(md_file)
-                self.documents.extend(docs)
-                logger.debug(f"Loaded {len(docs)} sections from {md_file.name}")
-            except Exception as e:
-                logger.error(f"Error loading {md_file.name}: {e}")
+        # A handful of small files, parsed in pure Python - sequential is as fast as threads
+        self.documents = [
+            doc for md_file in self._iter_markdown_files() for doc in self._parse_file_safely(md_file)
+        ]
+        self._by_type = {}
+        self._by_file = {}
+        for doc in self.documents:
+            self._by_type.setdefault(doc.metadata.get("type"), []).append(doc)
+            self._by_file.setdefault(doc.file_name, []).append(doc)
+        self._loaded = True
         
         logger.info(f"Total metadata documents loaded: {len(self.documents)}")
         return self.documents
     
+    def _parse_file_safely(self, md_file: Path) -> List[MetadataDocument]:
+        """Parse one metadata file; errors are logged and yield no documents."""
+        try:
+            docs = self._parse_markdown_file(md_file)
+        except Exception as e:
+            logger.error(f"Error loading {md_file.name}: {e}")
+            return []
+        logger.debug(f"Loaded {len(docs)} sections from {md_file.name}")
+        return docs
+    
+    def _iter_markdown_files(self) -> Iterator[Path]:
+        """All .md files in the dataset directory (one scandir, no Path per non-match)."""
+        try:
+            with os.scandir(self.dataset_metadata_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.md') and not entry.name.startswith('.') and entry.is_file():
+                        yield Path(entry.path)
+        except FileNotFoundError:
+            logger.warning(f"Metadata directory not found: {self.dataset_metadata_dir}")
+    
     def _parse_markdown_file(self, file_path: Path) -> List[MetadataDocument]:
         """
         Parse a markdown file into metadata documents.
@@ -116,138 +158,93 @@ class MetadataLoader:
         
         # Determine parsing strategy based on file type
         if file_name == "business_rules":
-            return self._parse_business_rules(file_name, content)
+            style = _BUSINESS_RULES_STYLE
         elif file_name == "query_patterns":
-            return self._parse_query_patterns(file_name, content)
+            style = _QUERY_PATTERNS_STYLE
         else:
             # Table schema files or other metadata
-            return self._parse_table_schema(file_name, content)
+            style = _TABLE_SCHEMA_STYLE
+        return self._parse_sections(file_name, content, style)
     
-    def _parse_business_rules(self, file_name: str, content: str) -> List[MetadataDocument]:
-        """Parse business_rules.md into individual rule documents."""
-        documents = []
+    def _parse_sections(self, file_name: str, content: str, style: tuple) -> List[MetadataDocument]:
+        """
+        Split markdown content into documents in one pass over its lines.
         
-        # Split by ## RULE: headings
-        rule_pattern = r'##\s+RULE:\s+([^\n]+)'
-        sections = re.split(rule_pattern, content)
+        Lines are buffered per section and joined once when the next heading
+        (or the end of the file) closes the section.
         
-        # First section is header/intro
-        if sections[0].strip():
-            documents.append(MetadataDocument(
-                dataset_id=self.dataset_id,
-                file_name=file_name,
-                section="introduction",
-                content=sections[0].strip(),
-                metadata={"type": "introduction"}
-            ))
+        Args:
+            file_name: Name of the file (without extension)
+            content: Markdown text
+            style: One of the _*_STYLE section strategies
+            
+        Returns:
+            List of MetadataDocument objects (intro/overview first, then one per section)
+        """
+        heading_re, section_prefix, heading, doc_type, title_key = style
+        documents = []
         
-        # Process rule sections (pattern produces [rule_title, rule_content, ...])
-        for i in range(1, len(sections), 2):
-            if i + 1 < len(sections):
-                rule_title = sections[i].strip()
-                rule_content = sections[i + 1].strip()
-                
-                # Create document for this rule
+        title = None  # None while in the text before the first heading
+        lines = []
+        for line in content.split('\n') + [None]:
+            match = heading_re.match(line) if line is not None else None
+            if line is not None and match is None:
+                lines.append(line)
+                continue
+            
+            text = '\n'.join(lines)
+            body = text.strip()
+            if title is None:
+                if body:
+                    documents.append(self._intro_document(file_name, text, body, doc_type))
+            else:
                 documents.append(MetadataDocument(
                     dataset_id=self.dataset_id,
                     file_name=file_name,
-                    section=f"rule_{rule_title.lower().replace(' ', '_')}",
-                    content=f"# RULE: {rule_title}\n\n{rule_content}",
+                    section=f"{section_prefix}{title.lower().replace(' ', '_')}",
+                    content=f"{heading}{title}\n\n{body}",
                     metadata={
-                        "type": "business_rule",
-                        "rule_title": rule_title
+                        "type": doc_type,
+                        title_key: title
                     }
                 ))
+            
+            if match is not None:
+                title = match.group(1).strip()
+                lines = []
         
-        logger.debug(f"Parsed {len(documents)} business rules")
+        logger.debug(f"Parsed {len(documents)} sections from {file_name}")
         return documents
     
-    def _parse_query_patterns(self, file_name: str, content: str) -> List[MetadataDocument]:
-        """Parse query_patterns.md into individual pattern documents."""
-        documents = []
-        
-        # Split by ### Pattern headings or ## category headings
-        pattern_regex = r'###\s+([^\n]+)'
-        sections = re.split(pattern_regex, content)
-        
-        # First section is header
-        if sections[0].strip():
-            documents.append(MetadataDocument(
+    def _intro_document(self, file_name: str, text: str, body: str, doc_type: str) -> MetadataDocument:
+        """Document for the text before the first section heading."""
+        if doc_type != "table_metadata":
+            return MetadataDocument(
                 dataset_id=self.dataset_id,
                 file_name=file_name,
                 section="introduction",
-                content=sections[0].strip(),
+                content=body,
                 metadata={"type": "introduction"}
-            ))
+            )
         
-        # Process pattern sections
-        for i in range(1, len(sections), 2):
-            if i + 1 < len(sections):
-                pattern_title = sections[i].strip()
-                pattern_content = sections[i + 1].strip()
-                
-                documents.append(MetadataDocument(
-                    dataset_id=self.dataset_id,
-                    file_name=file_name,
-                    section=f"pattern_{pattern_title.lower().replace(' ', '_')}",
-                    content=f"### {pattern_title}\n\n{pattern_content}",
-                    metadata={
-                        "type": "query_pattern",
-                        "pattern_title": pattern_title
-                    }
-                ))
+        # Extract table name from first # heading if present
+        title_match = _TITLE_RE.match(text)
+        table_name = title_match.group(1).strip() if title_match else file_name
         
-        logger.debug(f"Parsed {len(documents)} query patterns")
-        return documents
-    
-    def _parse_table_schema(self, file_name: str, content: str) -> List[MetadataDocument]:
-        """Parse table schema or other metadata files by major sections."""
-        documents = []
-        
-        # Split by ## headings (major sections)
-        section_pattern = r'##\s+([^\n]+)'
-        sections = re.split(section_pattern, content)
-        
-        # Handle the content before first ## (usually title and description)
-        if sections[0].strip():
-            # Extract table name from first # heading if present
-            title_match = re.match(r'#\s+([^\n]+)', sections[0])
-            table_name = title_match.group(1).strip() if title_match else file_name
-            
-            documents.append(MetadataDocument(
-                dataset_id=self.dataset_id,
-                file_name=file_name,
-                section="overview",
-                content=sections[0].strip(),
-                metadata={
-                    "type": "table_metadata",
-                    "table_name": table_name
-                }
-            ))
-        
-        # Process remaining sections
-        for i in range(1, len(sections), 2):
-            if i + 1 < len(sections):
-                section_title = sections[i].strip()
-                section_content = sections[i + 1].strip()
-                
-                documents.append(MetadataDocument(
-                    dataset_id=self.dataset_id,
-                    file_name=file_name,
-                    section=section_title.lower().replace(' ', '_'),
-                    content=f"## {section_title}\n\n{section_content}",
-                    metadata={
-                        "type": "table_metadata",
-                        "section_title": section_title
-                    }
-                ))
-        
-        logger.debug(f"Parsed {len(documents)} sections from {file_name}")
-        return documents
+        return MetadataDocument(
+            dataset_id=self.dataset_id,
+            file_name=file_name,
+            section="overview",
+            content=body,
+            metadata={
+                "type": "table_metadata",
+                "table_name": table_name
+            }
+        )
     
     def get_documents_by_type(self, doc_type: str) -> List[MetadataDocument]:
         """
-        Filter documents by type.
+        Filter documents by type (indexed at load time).
         
         Args:
             doc_type: Document type (business_rule, query_pattern, table_metadata)
@@ -255,7 +252,7 @@ class MetadataLoader:
         Returns:
             Filtered list of documents
         """
-        return [doc for doc in self.documents if doc.metadata.get("type") == doc_type]
+        return list(self._by_type.get(doc_type, ()))
     
     def get_documents_by_file(self, file_name: str) -> List[MetadataDocument]:
         """
@@ -267,22 +264,34 @@ class MetadataLoader:
         Returns:
             Documents from that file
         """
-        return [doc for doc in self.documents if doc.file_name == file_name]
+        if not self._loaded:
+            # Nothing loaded yet - parse just this file instead of the whole directory
+            md_file = self.dataset_metadata_dir / f"{file_name}.md"
+            if not md_file.is_file():
+                return []
+            try:
+                return self._parse_markdown_file(md_file)
+            except Exception as e:
+                logger.error(f"Error loading {md_file.name}: {e}")
+                return []
+        return list(self._by_file.get(file_name, ()))
     
-    def search_content(self, keyword: str) -> List[MetadataDocument]:
+    def search_content(self, keyword: str, doc_type: Optional[str] = None) -> List[MetadataDocument]:
         """
         Simple keyword search across all content.
         
         Args:
             keyword: Search term (case-insensitive)
+            doc_type: Only search documents of this type (uses the type index)
             
         Returns:
             Documents containing the keyword
         """
         keyword_lower = keyword.lower()
+        candidates = self.documents if doc_type is None else self._by_type.get(doc_type, ())
         return [
-            doc for doc in self.documents 
-            if keyword_lower in doc.content.lower()
+            doc for doc in candidates 
+            if keyword_lower in doc.content_lower
         ]
     
     def get_statistics(self) -> Dict:
@@ -291,19 +300,24 @@ class MetadataLoader:
             "dataset_id": self.dataset_id,
             "total_documents": len(self.documents),
             "by_type": {
-                "business_rules": len(self.get_documents_by_type("business_rule")),
-                "query_patterns": len(self.get_documents_by_type("query_pattern")),
-                "table_metadata": len(self.get_documents_by_type("table_metadata")),
+                "business_rules": len(self._by_type.get("business_rule", ())),
+                "query_patterns": len(self._by_type.get("query_pattern", ())),
+                "table_metadata": len(self._by_type.get("table_metadata", ())),
             },
-            "unique_files": len(set(doc.file_name for doc in self.documents)),
+            "unique_files": len(self._by_file),
             "metadata_directory": str(self.dataset_metadata_dir)
         }
 
 
+@lru_cache(maxsize=8)
 def load_dataset_metadata(dataset_id: str) -> MetadataLoader:
     """
     Convenience function to load metadata for a dataset.
     
+    The loader is built once per dataset and shared, so callers must not
+    mutate it. Call load_dataset_metadata.cache_clear() after editing the
+    metadata files.
+    
     Args:
         dataset_id: Dataset identifier
         
@@ -6,13 +6,65 @@ timeout management, and result formatting.
 """
 
 import logging
+import re
+import threading
 import time
-from sqlalchemy import create_engine, text
+from urllib.parse import quote
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.exc import SQLAlchemyError
 from config import Config
+from services.sql_validator import find_write_keyword
+
+# TTLCache bounds the repeated-query result cache; without cachetools the cache is disabled
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
 
 logger = logging.getLogger(__name__)
 
+# SQLite error classes with a user-friendly message (one scan of the error text)
+_SQL_ERROR_RE = re.compile(
+    r"(?P<table>no such table)|(?P<column>no such column)|(?P<syntax>syntax error)",
+    re.IGNORECASE
+)
+_SQL_ERROR_MESSAGES = {
+    "table": "Database table not found. Please check your query.",
+    "column": "Column not found in database. Please check your query.",
+    "syntax": "SQL syntax error. Please try rephrasing your query.",
+}
+
+# SQL whose result can change between identical runs is never served from the cache
+_NONDETERMINISTIC_RE = re.compile(
+    r"\b(?:random|randomblob|current_date|current_time|current_timestamp|changes|last_insert_rowid)\b|'now'",
+    re.IGNORECASE
+)
+
+# Per-connection read tuning: memory-mapped reads, in-memory temp tables, 64 MB page cache
+SQLITE_READ_PRAGMAS = (
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+
+def sqlite_read_only_uri(db_path):
+    """
+    SQLite URI filename that opens db_path read-only (pass uri=True to sqlite3.connect).
+
+    Read-only connections never take write locks or touch the journal, and a
+    missing file is an error instead of a new empty database.
+    """
+    return f"file:{quote(str(db_path))}?mode=ro"
+
+
+def apply_read_pragmas(conn, _connection_record=None):
+    """Apply SQLITE_READ_PRAGMAS to a new DB-API connection (also a SQLAlchemy connect listener)."""
+    cursor = conn.cursor()
+    for pragma in SQLITE_READ_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 
 class QueryExecutor:
     """Service for executing SQL queries safely against the database."""
@@ -25,7 +77,7 @@ class QueryExecutor:
             database_path (str, optional): Path to database. Uses Config.DATABASE_PATH if None.
         """
         self.database_path = database_path or Config.DATABASE_PATH
-        self.database_url = f'sqlite:///{self.database_path}'
+        self.database_url = f'sqlite:///{sqlite_read_only_uri(self.database_path)}&uri=true'
         self.max_results = Config.MAX_QUERY_RESULTS
 
         # Create engine with read-only mode (for safety)
@@ -34,6 +86,13 @@ class QueryExecutor:
             connect_args={'check_same_thread': False},
             echo=False
         )
+        event.listen(self.engine, "connect", apply_read_pragmas)
+
+        # Results of recently executed SQL, keyed by the query text (retries and
+        # follow-ups often re-run the exact same query)
+        self._sql_cache = (TTLCache(maxsize=Config.QUERY_CACHE_SIZE, ttl=Config.QUERY_CACHE_TTL)
+                           if TTLCache and Config.QUERY_CACHE_SIZE else None)
+        self._sql_cache_lock = threading.Lock()
 
         logger.info(f"Query executor initialized with database: {self.database_path}")
 
@@ -56,8 +115,32 @@ class QueryExecutor:
         """
         logger.info(f"Executing query: {sql_query[:200]}...")
 
+        # Writes, ATTACH and PRAGMA are refused before touching SQLite (AST check,
+        # so string literals and identifiers that contain the words are fine)
+        unsafe = find_write_keyword(sql_query)
+        if unsafe:
+            logger.warning("Rejected query with %s statement", unsafe)
+            raise ValueError(f"Only read-only queries can be executed ({unsafe} is not allowed).")
+
         start_time = time.time()
 
+        # Exact-match cache; the key is only stripped, since whitespace and case
+        # inside string literals change the result
+        cache_key = None
+        if self._sql_cache is not None and not _NONDETERMINISTIC_RE.search(sql_query):
+            cache_key = sql_query.strip()
+            with self._sql_cache_lock:
+                cached = self._sql_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Query result served from cache: {cached['row_count']} rows")
+                # Fresh containers so callers can't mutate the cached result
+                return {
+                    'results': [dict(row) for row in cached['results']],
+                    'columns': list(cached['columns']),
+                    'row_count': cached['row_count'],
+                    'execution_time': round(time.time() - start_time, 3)
+                }
+
         try:
             with self.engine.connect() as connection:
                 # Execute query with timeout
@@ -69,24 +152,21 @@ class QueryExecutor:
                 # Get column names
                 columns = list(result.keys()) if result.returns_rows else []
 
-                # Convert rows to list of dictionaries
-                results = []
-                for row in rows:
-                    # Convert Row object to dictionary
-                    row_dict = {}
-                    for i, column in enumerate(columns):
-                        value = row[i]
-                        # Convert any non-JSON-serializable types
-                        if value is not None:
-                            row_dict[column] = value
-                        else:
-                            row_dict[column] = None
-                    results.append(row_dict)
+                # Convert rows to list of dictionaries (NULLs already come back as None)
+                results = [dict(zip(columns, row)) for row in rows]
 
                 execution_time = time.time() - start_time
 
                 logger.info(f"Query executed successfully: {len(results)} rows in {execution_time:.3f}s")
 
+                if cache_key is not None:
+                    with self._sql_cache_lock:
+                        self._sql_cache[cache_key] = {
+                            'results': [dict(row) for row in results],
+                            'columns': list(columns),
+                            'row_count': len(results)
+                        }
+
                 return {
                     'results': results,
                     'columns': columns,
@@ -100,20 +180,22 @@ class QueryExecutor:
 
             # Provide user-friendly error message
             error_msg = str(e)
-            if "no such table" in error_msg.lower():
-                raise ValueError("Database table not found. Please check your query.") from e
-            elif "no such column" in error_msg.lower():
-                raise ValueError("Column not found in database. Please check your query.") from e
-            elif "syntax error" in error_msg.lower():
-                raise ValueError("SQL syntax error. Please try rephrasing your query.") from e
-            else:
-                raise ValueError(f"Query execution failed: {error_msg}") from e
+            error_kind = _SQL_ERROR_RE.search(error_msg)
+            if error_kind:
+                raise ValueError(_SQL_ERROR_MESSAGES[error_kind.lastgroup]) from e
+            raise ValueError(f"Query execution failed: {error_msg}") from e
 
         except Exception as e:
             execution_time = time.time() - start_time
             logger.error(f"Unexpected error executing query: {e}")
             raise ValueError(f"Unexpected error: {str(e)}") from e
 
+    def clear_sql_cache(self):
+        """Drop cached query results (after the database changes; useful for testing)."""
+        if self._sql_cache is not None:
+            with self._sql_cache_lock:
+                self._sql_cache.clear()
+
     def test_connection(self):
         """
         Test database connection.
@@ -165,10 +247,15 @@ class QueryExecutor:
         tables = ['clients', 'products', 'sales', 'customer_segments']
         table_info = {}
 
+        # All counts in one statement and one result set
+        sql_query = " UNION ALL ".join(
+            f"SELECT '{table}' AS table_name, COUNT(*) AS count FROM {table}" for table in tables
+        )
+
         try:
-            for table in tables:
-                result = self.execute_query(f"SELECT COUNT(*) as count FROM {table}")
-                table_info[table] = result['results'][0]['count']
+            result = self.execute_query(sql_query)
+            for row in result['results']:
+                table_info[row['table_name']] = row['count']
 
             return table_info
 
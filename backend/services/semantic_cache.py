@@ -0,0 +1,237 @@
+"""
+Semantic cache for generated SQL.
+
+Paraphrased questions ("top brands by revenue" vs "which brands have the highest
+revenue") produce the same SQL, so a near-duplicate question within the same
+namespace (dataset, client, schema) reuses the earlier result instead of
+calling Claude again. Embedding similarity alone cannot tell "revenue in 2023"
+from "revenue in 2024", so a hit also requires the numbers, quoted values and
+capitalized names (countries, brands) of both questions to match exactly.
+
+Only SQL that passed security validation and executed is stored (callers use
+ClaudeService.cache_result after execution). The cache is off by default
+(semantic_cache.enabled in config.json).
+
+Optional dependencies (requirements-semantic-cache.txt): sentence-transformers
+(local MiniLM embeddings) and sqlite-vec (vector index in an in-memory SQLite
+database). Without them the cache is disabled and every lookup misses.
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import sqlite_vec
+except ImportError:
+    sqlite_vec = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_TTL_SECONDS = 3600
+
+# Output size of the MiniLM embedding model
+EMBEDDING_DIM = 384
+
+# Nearest neighbours fetched per lookup before the TTL filter
+_KNN_CANDIDATES = 8
+
+# Tokens that change the meaning of a question without moving its embedding much:
+# numbers and years, quoted values, and capitalized names
+_SIGNATURE_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|'[^']*'|\"[^\"]*\"|\b[A-Z][\w&'-]*")
+
+# Punctuation that ends a sentence; the capitalized word after it is not a name
+_SENTENCE_END = ".!?"
+
+
+def query_signature(query: str) -> str:
+    """
+    Exact-match key for the literal values in a question.
+
+    Two questions can share a cache entry only if their signatures are equal,
+    e.g. "revenue in 2023" and "revenue in 2024" never do. The first word of a
+    sentence is skipped, so "Top brands ..." and "Which brands ..." still match.
+    """
+    tokens = []
+    for match in _SIGNATURE_TOKEN_RE.finditer(query):
+        token = match.group()
+        if token[0].isupper():
+            preceding = query[:match.start()].rstrip()
+            if not preceding or preceding[-1] in _SENTENCE_END:
+                continue
+        tokens.append(token.lower())
+    return "\x1f".join(tokens)
+
+
+class SemanticCache:
+    """Embedding-keyed cache of (SQL, chart metadata) per namespace."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS
+    ):
+        """
+        Initialize the cache (the embedding model is loaded on first use).
+
+        Args:
+            model_name: sentence-transformers model for query embeddings
+            similarity_threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Entry lifetime
+        """
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.enabled = sqlite_vec is not None and SentenceTransformer is not None
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if not self.enabled:
+            logger.info("Semantic cache disabled (sentence-transformers / sqlite-vec not installed)")
+            return
+
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.enable_load_extension(True)
+        sqlite_vec.load(self._conn)
+        self._conn.enable_load_extension(False)
+        self._conn.execute(
+            "CREATE TABLE entries (id INTEGER PRIMARY KEY, signature TEXT NOT NULL, "
+            "sql TEXT NOT NULL, chart_metadata TEXT, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE vec_entries USING vec0("
+            f"namespace TEXT PARTITION KEY, "
+            f"embedding FLOAT[{EMBEDDING_DIM}] distance_metric=cosine)"
+        )
+        # Embeddings per query text - lookup and store for the same question encode once
+        self._embed = lru_cache(maxsize=256)(self._encode)
+
+    def _get_model(self):
+        """Load the embedding model on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"Loading semantic cache embedding model: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode(self, query: str) -> bytes:
+        """Normalized query embedding, serialized for sqlite-vec."""
+        vector = self._get_model().encode(query, normalize_embeddings=True)
+        return sqlite_vec.serialize_float32(vector.tolist())
+
+    def lookup(self, namespace: str, query: str) -> Optional[Tuple[str, Optional[Dict]]]:
+        """
+        Find a cached result for a near-duplicate query with the same literal values.
+
+        Args:
+            namespace: Cache partition (dataset, client and schema)
+            query: Natural language query
+
+        Returns:
+            (sql, chart_metadata) on a hit, None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        embedding = self._embed(query)
+        max_distance = 1.0 - self.similarity_threshold
+        min_created_at = time.time() - self.ttl_seconds
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.sql, e.chart_metadata, v.distance FROM ("
+                "  SELECT rowid, distance FROM vec_entries"
+                "  WHERE embedding MATCH ? AND k = ? AND namespace = ?"
+                ") v JOIN entries e ON e.id = v.rowid "
+                "WHERE v.distance <= ? AND e.created_at >= ? AND e.signature = ? "
+                "ORDER BY v.distance LIMIT 1",
+                (embedding, _KNN_CANDIDATES, namespace, max_distance, min_created_at,
+                 query_signature(query))
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        sql, chart_metadata, distance = row
+        logger.info(f"Semantic cache hit (similarity={1.0 - distance:.3f})")
+        return sql, json.loads(chart_metadata) if chart_metadata else None
+
+    def store(self, namespace: str, query: str, sql: str, chart_metadata: Optional[Dict] = None) -> None:
+        """
+        Cache the result for a query; expired entries are purged on the way.
+
+        Only call this for SQL that passed validation and executed successfully.
+
+        Args:
+            namespace: Cache partition (dataset, client and schema)
+            query: Natural language query
+            sql: Generated SQL
+            chart_metadata: Chart metadata from the same generation call
+        """
+        if not self.enabled:
+            return
+
+        embedding = self._embed(query)
+        now = time.time()
+
+        with self._lock:
+            expired = [row_id for (row_id,) in self._conn.execute(
+                "SELECT id FROM entries WHERE created_at < ?", (now - self.ttl_seconds,)
+            )]
+            if expired:
+                placeholders = ",".join("?" * len(expired))
+                self._conn.execute(f"DELETE FROM vec_entries WHERE rowid IN ({placeholders})", expired)
+                self._conn.execute(f"DELETE FROM entries WHERE id IN ({placeholders})", expired)
+
+            cursor = self._conn.execute(
+                "INSERT INTO entries (signature, sql, chart_metadata, created_at) VALUES (?, ?, ?, ?)",
+                (query_signature(query), sql, json.dumps(chart_metadata) if chart_metadata else None, now)
+            )
+            self._conn.execute(
+                "INSERT INTO vec_entries (rowid, namespace, embedding) VALUES (?, ?, ?)",
+                (cursor.lastrowid, namespace, embedding)
+            )
+            self._conn.commit()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Process-wide semantic cache built from Config (None when disabled in config).
+
+    Shared across ClaudeService instances so every request handler sees the same entries.
+    """
+    global _shared_cache
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SemanticCache(
+                    model_name=Config.SEMANTIC_CACHE_MODEL,
+                    similarity_threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                    ttl_seconds=Config.SEMANTIC_CACHE_TTL
+                )
+    return _shared_cache
@@ -7,45 +7,344 @@ This service validates generated SQL queries to ensure:
 3. Read-only operations (no destructive keywords)
 
 This is a critical security layer for multi-tenant data isolation.
+
+Queries are parsed with sqlglot so comments, string literals and column
+aliases cannot fake or hide a filter; SQL that sqlglot cannot parse falls
+back to keyword/regex scanning.
 """
 
 import re
 import logging
 import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+import sqlglot
+from sqlglot import exp
 
 logger = logging.getLogger(__name__)
 
+# Destructive SQL keywords, in reporting priority order
+DESTRUCTIVE_KEYWORDS = ("DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "TRUNCATE", "CREATE", "GRANT", "REVOKE")
+_DESTRUCTIVE_SET = frozenset(DESTRUCTIVE_KEYWORDS)
+
+# Every keyword the checks and warnings look at - one word-bounded,
+# case-insensitive alternation, so the SQL is scanned once for all of them
+_SCAN_KEYWORDS = ("WHERE", "AND", "SELECT", "UNION") + DESTRUCTIVE_KEYWORDS
+_KEYWORD_SCAN_RE = re.compile(r'\b(' + '|'.join(_SCAN_KEYWORDS) + r')\b', re.IGNORECASE)
+
+# Checks whose wording never varies. Cached results share them, and callers
+# only ever see copies (see validate_sql_for_client_isolation)
+_SINGLE_CLIENT_PASS = {
+    "name": "Single Client",
+    "status": "PASS",
+    "message": "Query correctly references only one client"
+}
+_READ_ONLY_PASS = {
+    "name": "Read-Only",
+    "status": "PASS",
+    "message": "Query is read-only (SELECT only)"
+}
+
+# First word of the statement, after any leading whitespace or parentheses.
+# An anchored match only reads the prefix; it measured faster than a hand-written loop.
+_LEADING_KEYWORD_RE = re.compile(r'[\s(]*(\w+)')
+
+# Statement nodes reported as destructive keywords (Alter was AlterTable before sqlglot 26)
+_WRITE_NODES = (
+    (exp.Drop, "DROP"),
+    (exp.Delete, "DELETE"),
+    (exp.Update, "UPDATE"),
+    (exp.Insert, "INSERT"),
+    (getattr(exp, "Alter", None) or exp.AlterTable, "ALTER"),
+    (exp.TruncateTable, "TRUNCATE"),
+    (exp.Create, "CREATE"),
+)
+
+# Multi-statement root (only produced by newer sqlglot; isinstance(x, ()) is always False)
+_BLOCK = getattr(exp, "Block", ())
+
+# What the checks and warnings need to know about a query, from either path.
+# filters holds one (value, in_where) entry per filter_field = N comparison;
+# union_branches holds one (filtered, filtered_in_where) entry per UNION branch
+# (empty when the SQL could not be parsed - the UNION warning still applies).
+_QueryFacts = namedtuple(
+    "_QueryFacts",
+    ["filters", "in_clause", "destructive", "where_count", "select_count", "has_union",
+     "union_branches"]
+)
+
+
+@lru_cache(maxsize=256)
+def _parse_sql(sql_query):
+    """
+    Parse SQL into a sqlglot AST (SQLite dialect), cached per SQL string.
+
+    Callers must treat the returned tree as read-only since it is shared.
+
+    Returns:
+        Parsed expression, or None if the SQL cannot be parsed
+    """
+    try:
+        return sqlglot.parse_one(sql_query, read="sqlite")
+    except sqlglot.errors.SqlglotError as e:
+        logger.debug("sqlglot could not parse SQL: %s", e)
+        return None
+
+
+@lru_cache(maxsize=32)
+def _get_field_re(filter_field):
+    """
+    Compile the equality and IN-clause patterns for a filter field.
+
+    filter_field comes from dataset config and is escaped, so it always
+    matches literally. The equality pattern captures the value only when it
+    is a whole number, so "client_id = 5abc" is not mistaken for a filter on 5.
+
+    Returns:
+        tuple: (eq_re, in_re) compiled case-insensitive patterns
+    """
+    field = re.escape(filter_field)
+    eq_re = re.compile(rf'\b{field}\s*=\s*(\d+)\b', re.IGNORECASE)
+    in_re = re.compile(rf'\b{field}\s+IN\s*\([^)]+\)', re.IGNORECASE)
+    return eq_re, in_re
+
+
+def _scan_sql(sql_query):
+    """
+    Scan the query once for keywords used by the checks and warnings.
+
+    Returns:
+        tuple: (counts, first_context, last_where) where counts maps each
+            upper-cased keyword to its number of occurrences, first_context is
+            the offset of the first WHERE/AND followed by whitespace (or None)
+            and last_where is the offset of the last WHERE (-1 if none)
+    """
+    counts = Counter()
+    first_context = None
+    last_where = -1
+
+    for match in _KEYWORD_SCAN_RE.finditer(sql_query):
+        keyword = match.group(1).upper()
+        counts[keyword] += 1
+        if keyword == "WHERE":
+            last_where = match.start()
+        if (first_context is None and keyword in ("WHERE", "AND")
+                and sql_query[match.end():match.end() + 1].isspace()):
+            first_context = match.start()
+
+    return counts, first_context, last_where
+
+
+def _write_keyword(tree):
+    """
+    Return the keyword that makes a parsed query non-read-only, or None.
+
+    Write statements are reported in DESTRUCTIVE_KEYWORDS priority order;
+    any other non-query statement (PRAGMA, VACUUM, ...) is reported by name.
+    """
+    found = {keyword for node_type, keyword in _WRITE_NODES if tree.find(node_type)}
+    found.update(str(command.this).upper() for command in tree.find_all(exp.Command))
+    keyword = next((k for k in DESTRUCTIVE_KEYWORDS if k in found), None)
+    if keyword:
+        return keyword
+
+    statements = tree.expressions if isinstance(tree, _BLOCK) else [tree]
+    for statement in statements:
+        if not isinstance(statement, exp.Query):
+            if isinstance(statement, exp.Command):
+                return str(statement.this).upper()
+            return statement.key.upper()
+    return None
+
+
+# Statements SQLite runs as reads; anything else is refused when the SQL cannot be parsed
+_READ_STATEMENT_KEYWORDS = frozenset(("SELECT", "WITH", "VALUES"))
+
+
+def find_write_keyword(sql_query):
+    """
+    Return the keyword that makes sql_query something other than a read, or None.
+
+    Uses the AST, so keywords inside string literals, comments and identifiers
+    are ignored. SQL that cannot be parsed is judged by its first keyword.
+    """
+    tree = _parse_sql(sql_query)
+    if tree is not None:
+        return _write_keyword(tree)
+    leading = _LEADING_KEYWORD_RE.match(sql_query)
+    if leading is None:
+        return None
+    keyword = leading.group(1).upper()
+    return None if keyword in _READ_STATEMENT_KEYWORDS else keyword
+
+
+def _filter_comparisons(node, field):
+    """Yield (value, eq_node) for each field = N comparison under node."""
+    for eq in node.find_all(exp.EQ):
+        # Accept both "client_id = 5" and "5 = client_id"; quoted '5' is the same id
+        for column, value in ((eq.left, eq.right), (eq.right, eq.left)):
+            if (isinstance(column, exp.Column) and column.name.lower() == field
+                    and isinstance(value, exp.Literal) and value.this.isdigit()):
+                yield int(value.this), eq
+                break
+
+
+def _union_branches(tree, field):
+    """(filtered, filtered_in_where) for every SELECT combined by a UNION."""
+    branches = []
+    for union in tree.find_all(exp.Union):
+        for branch in (union.this, union.expression):
+            while isinstance(branch, exp.Subquery):
+                branch = branch.this
+            if isinstance(branch, exp.Union):
+                continue  # its own branches are visited as a separate UNION node
+            where = branch.args.get("where")
+            branches.append((
+                next(_filter_comparisons(branch, field), None) is not None,
+                where is not None and next(_filter_comparisons(where, field), None) is not None,
+            ))
+    return branches
+
+
+def _facts_from_ast(tree, filter_field):
+    """Collect _QueryFacts from a parsed query."""
+    field = filter_field.lower()
+
+    filters = [
+        (value, eq.find_ancestor(exp.Where) is not None)
+        for value, eq in _filter_comparisons(tree, field)
+    ]
+
+    in_clause = any(
+        isinstance(node.this, exp.Column) and node.this.name.lower() == field
+        for node in tree.find_all(exp.In)
+    )
+
+    return _QueryFacts(
+        filters=filters,
+        in_clause=in_clause,
+        destructive=_write_keyword(tree),
+        where_count=sum(1 for _ in tree.find_all(exp.Where)),
+        select_count=sum(1 for _ in tree.find_all(exp.Select)),
+        has_union=tree.find(exp.Union) is not None,
+        union_branches=_union_branches(tree, field),
+    )
+
+
+def _facts_from_text(sql_query, filter_field):
+    """
+    Collect _QueryFacts by scanning SQL that sqlglot cannot parse.
+
+    A filter counts as inside a WHERE when a WHERE/AND precedes it or a
+    WHERE follows it (subqueries).
+    """
+    keyword_counts, first_context, last_where = _scan_sql(sql_query)
+    eq_re, in_re = _get_field_re(filter_field)
+
+    filters = [
+        (int(m.group(1)),
+         (first_context is not None and first_context < m.start()) or last_where >= m.end())
+        for m in eq_re.finditer(sql_query)
+    ]
+
+    return _QueryFacts(
+        filters=filters,
+        in_clause=in_re.search(sql_query) is not None,
+        destructive=next((k for k in DESTRUCTIVE_KEYWORDS if keyword_counts[k]), None),
+        where_count=keyword_counts["WHERE"],
+        select_count=keyword_counts["SELECT"],
+        has_union=keyword_counts["UNION"] > 0,
+        union_branches=[],
+    )
+
 
 class ValidationResult:
     """Container for validation results."""
 
+    __slots__ = ('passed', 'checks', 'warnings', 'execution_time', '_dict_cache')
+
     def __init__(self, passed, checks, warnings, execution_time=0.0):
         self.passed = passed
         self.checks = checks
         self.warnings = warnings
         self.execution_time = execution_time
+        self._dict_cache = None
 
     def to_dict(self):
-        """Convert to dictionary for JSON serialization."""
-        return {
-            'passed': self.passed,
-            'checks': self.checks,
-            'warnings': self.warnings,
-            'execution_time': round(self.execution_time, 3)
-        }
+        """
+        Convert to dictionary for JSON serialization.
+
+        Built on first call and reused afterwards; results are not modified
+        once returned by validate_sql_for_client_isolation.
+        """
+        if self._dict_cache is None:
+            self._dict_cache = {
+                'passed': self.passed,
+                'checks': self.checks,
+                'warnings': self.warnings,
+                'execution_time': round(self.execution_time, 3)
+            }
+        return self._dict_cache
+
+
+class ValidatorConfig:
+    """
+    Isolation settings of one dataset, read once from its config.
+
+    Pass an instance instead of the dataset config dict when validating
+    many queries for the same dataset.
+    """
+
+    __slots__ = ('filter_field', 'filter_method', 'dataset_name')
+
+    def __init__(self, filter_field="client_id", filter_method="row-level", dataset_name="unknown"):
+        self.filter_field = filter_field
+        self.filter_method = filter_method
+        self.dataset_name = dataset_name
+
+    @classmethod
+    def from_dataset(cls, dataset_config):
+        """
+        Build from a dataset config dict (or None for the row-level client_id default).
+
+        Args:
+            dataset_config (dict, optional): Dataset configuration with client_isolation info
+
+        Returns:
+            ValidatorConfig: Settings for the dataset
+        """
+        if not dataset_config:
+            return cls()
 
+        client_iso = dataset_config.get('client_isolation', {})
+        return cls(
+            filter_field=client_iso.get('filter_field', 'client_id'),
+            filter_method=client_iso.get('method', 'row-level'),
+            dataset_name=dataset_config.get('name'),
+        )
 
-def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_config=None):
+    @classmethod
+    def coerce(cls, dataset_config):
+        """Return dataset_config as-is if already a ValidatorConfig, else build one."""
+        if isinstance(dataset_config, cls):
+            return dataset_config
+        return cls.from_dataset(dataset_config)
+
+
+def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_config=None, measure_time=True):
     """
     Validate SQL query for client data isolation (method-driven validation).
 
-    This performs basic string-based validation for POC demonstration.
-    In production, use a proper SQL parser (sqlparse, pglast, etc.).
+    The query is parsed with sqlglot (SQLite dialect); keyword/regex scanning
+    is used only for SQL that does not parse.
 
     Args:
         sql_query (str): SQL query to validate
         expected_client_id (int): Expected client ID that should be filtered
-        dataset_config (dict, optional): Dataset configuration with client_isolation info
+        dataset_config (dict or ValidatorConfig, optional): Dataset configuration
+            with client_isolation info, or settings already extracted from it
+        measure_time (bool): Time the validation; when False execution_time is 0.0
 
     Returns:
         ValidationResult: Validation results with checks and warnings
@@ -60,18 +359,110 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
         - Uses config's filter_field (client_id, corp_id, etc.)
         - Adapts validation patterns to dataset requirements
         - Provides method-specific error messages
+
+    Results are memoized per (sql_query, expected_client_id, isolation method,
+    filter_field), so retries and re-displays of the same query skip the scan.
+    Call validate_sql_for_client_isolation.cache_clear() to reset.
+    """
+    start_time = time.perf_counter() if measure_time else None
+
+    config = ValidatorConfig.coerce(dataset_config)
+
+    logger.info("Validating SQL for client_id=%s, dataset=%s", expected_client_id, config.dataset_name)
+
+    # Only the isolation settings affect the outcome, so they form the cache key
+    hits_before = _validate_cached.cache_info().hits
+    passed, checks, warnings = _validate_cached(sql_query, expected_client_id, config.filter_field, config.filter_method)
+    if _validate_cached.cache_info().hits > hits_before:
+        logger.debug("Validation cache hit")
+
+    execution_time = time.perf_counter() - start_time if measure_time else 0.0
+    result = _build_result(passed, checks, warnings, execution_time)
+
+    if passed:
+        logger.info("✓ Validation PASSED in %.3fs", execution_time)
+    else:
+        logger.error("✗ Validation FAILED in %.3fs", execution_time)
+
+    return result
+
+
+def validate_sql_batch(sql_queries, client_ids, dataset_config=None):
+    """
+    Validate many queries against one dataset configuration.
+
+    Intended for regression suites and other bulk runs: the isolation
+    settings are read once, and the per-query timing and log lines of
+    validate_sql_for_client_isolation are skipped.
+
+    Args:
+        sql_queries (list): SQL queries to validate
+        client_ids (list): Expected client ID for each query, in the same order
+        dataset_config (dict or ValidatorConfig, optional): Dataset configuration
+            with client_isolation info, or settings already extracted from it
+
+    Returns:
+        list: One ValidationResult per query, in input order (execution_time is 0.0)
+
+    Raises:
+        ValueError: If sql_queries and client_ids differ in length
+    """
+    if len(sql_queries) != len(client_ids):
+        raise ValueError(f"Got {len(sql_queries)} queries but {len(client_ids)} client IDs")
+
+    config = ValidatorConfig.coerce(dataset_config)
+    results = [
+        _build_result(*_validate_cached(sql_query, client_id, config.filter_field, config.filter_method))
+        for sql_query, client_id in zip(sql_queries, client_ids)
+    ]
+
+    failed = sum(1 for result in results if not result.passed)
+    logger.info("Validated %d queries: %d failed", len(results), failed)
+    return results
+
+
+def _build_result(passed, checks, warnings, execution_time=0.0):
+    """Wrap a cached (passed, checks, warnings) triple in a caller-owned ValidationResult."""
+    # Callers get their own check/warning dicts; the cached ones stay untouched
+    return ValidationResult(
+        passed=passed,
+        checks=[dict(check) for check in checks],
+        warnings=[dict(warning) for warning in warnings],
+        execution_time=execution_time
+    )
+
+
+@lru_cache(maxsize=1024)
+def _validate_cached(sql_query, expected_client_id, filter_field, filter_method):
     """
-    start_time = time.time()
+    Run the isolation checks for one (query, client, isolation settings) key.
 
-    logger.info(f"Validating SQL for client_id={expected_client_id}, dataset={dataset_config.get('name') if dataset_config else 'unknown'}")
+    Returns:
+        tuple: (passed, checks, warnings) with checks and warnings as tuples
+            of dicts - treat them as read-only, they are shared between hits
+    """
+    # Fail fast: a statement that opens with a write keyword cannot be made safe
+    # by any filter, so skip parsing and the client checks entirely
+    leading = _LEADING_KEYWORD_RE.match(sql_query)
+    if leading is not None and leading.group(1).upper() in _DESTRUCTIVE_SET:
+        keyword = leading.group(1).upper()
+        logger.warning("Validation FAILED: Destructive keyword '%s' detected", keyword)
+        return False, ({
+            "name": "Read-Only",
+            "status": "FAIL",
+            "message": f"Destructive keyword detected: {keyword}. Only SELECT queries allowed."
+        },), ()
 
     checks = []
     warnings = []
     passed = True
 
-    # Normalize SQL for consistent checking
-    sql_upper = sql_query.upper()
-    sql_normalized = ' '.join(sql_query.split())  # Collapse whitespace
+    # Everything the checks and warnings need, from the AST when the SQL parses
+    tree = _parse_sql(sql_query)
+    if tree is not None:
+        facts = _facts_from_ast(tree, filter_field)
+    else:
+        facts = _facts_from_text(sql_query, filter_field)
 
     # ==========================================
     # Check 1: Client/Corporation ID Filter (MANDATORY - Method-Driven)
@@ -79,30 +470,22 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
     # ALL datasets MUST filter by client/corporation ID
     # Validation method is determined by config, not hardcoded table names
 
-    # Determine isolation method from config
-    filter_field = "client_id"  # Default
-    filter_method = "row-level"  # Default
+    # Check 1 and Check 2 are both answered from the filter_field = N comparisons,
+    # compared as integers (a client id that is not a number matches nothing)
+    try:
+        expected_id = int(expected_client_id)
+    except (TypeError, ValueError):
+        expected_id = None
+    expected_filters = [in_where for value, in_where in facts.filters if value == expected_id]
 
-    if dataset_config and 'client_isolation' in dataset_config:
-        client_iso = dataset_config['client_isolation']
-        filter_method = client_iso.get('method', 'row-level')
-        filter_field = client_iso.get('filter_field', 'client_id')
-    
     # Look for the appropriate filter pattern based on method
     if filter_method == "brand-hierarchy":
         # Brand-hierarchy method: check for filter_field anywhere in query
         # More flexible validation - allows complex join patterns
-        filter_patterns = [
-            rf'\bWHERE\s+.*?\b{filter_field}\s*=\s*{expected_client_id}\b',
-            rf'\bAND\s+.*?\b{filter_field}\s*=\s*{expected_client_id}\b',
-            rf'\b{filter_field}\s*=\s*{expected_client_id}\b',  # Anywhere in query
-        ]
-
-        filter_found = False
-        for pattern in filter_patterns:
-            if re.search(pattern, sql_normalized, re.IGNORECASE):
-                filter_found = True
-                break
+        # Every UNION branch must filter too, or that branch returns all clients' rows
+        filter_found = bool(expected_filters) and all(
+            filtered for filtered, _ in facts.union_branches
+        )
 
         if not filter_found:
             passed = False
@@ -111,30 +494,23 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
                 "status": "FAIL",
                 "message": f"Missing {filter_field} = {expected_client_id} filter (method: {filter_method})"
             })
-            logger.warning(f"Validation FAILED: Missing {filter_field} filter for client {expected_client_id}")
+            logger.warning("Validation FAILED: Missing %s filter for client %s", filter_field, expected_client_id)
         else:
             checks.append({
                 "name": "Client ID Filter",
                 "status": "PASS",
                 "message": f"Found {filter_field} = {expected_client_id} filter"
             })
-            logger.debug(f"{filter_field} filter check: PASS")
+            logger.debug("%s filter check: PASS", filter_field)
     
     else:
         # Default: row-level filtering (generic filter_field)
-        # Pattern to find WHERE clause with filter_field filter
+        # The filter must sit in a WHERE clause (outer query or subquery),
+        # and in the WHERE of every UNION branch
         # Matches: WHERE filter_field = X OR WHERE t.filter_field = X OR WHERE ... AND filter_field = X
-        filter_patterns = [
-            rf'\bWHERE\s+.*?\b{filter_field}\s*=\s*{expected_client_id}\b',
-            rf'\bAND\s+.*?\b{filter_field}\s*=\s*{expected_client_id}\b',
-            rf'\b{filter_field}\s*=\s*{expected_client_id}\b.*?\bWHERE\b',  # In subqueries
-        ]
-
-        filter_found = False
-        for pattern in filter_patterns:
-            if re.search(pattern, sql_normalized, re.IGNORECASE):
-                filter_found = True
-                break
+        filter_found = any(expected_filters) and all(
+            in_where for _, in_where in facts.union_branches
+        )
 
         if not filter_found:
             passed = False
@@ -143,14 +519,14 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
                 "status": "FAIL",
                 "message": f"Missing WHERE {filter_field} = {expected_client_id} filter"
             })
-            logger.warning(f"Validation FAILED: Missing {filter_field} filter for client {expected_client_id}")
+            logger.warning("Validation FAILED: Missing %s filter for client %s", filter_field, expected_client_id)
         else:
             checks.append({
                 "name": "Client ID Filter",
                 "status": "PASS",
                 "message": f"Query correctly filters by {filter_field} = {expected_client_id}"
             })
-            logger.debug(f"{filter_field} filter check: PASS")
+            logger.debug("%s filter check: PASS", filter_field)
 
     # ==========================================
     # Check 2: Single Client
@@ -159,44 +535,42 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
     # This prevents queries like: WHERE filter_field IN (1,2,3) or filter_field = 5 OR filter_field = 6
 
     # Find all filter_field = N patterns
-    all_filter_matches = re.findall(rf'\b{filter_field}\s*=\s*(\d+)', sql_normalized, re.IGNORECASE)
-    all_filter_ids = [int(match) for match in all_filter_matches]
+    all_filter_ids = [value for value, _ in facts.filters]
+    first_id = all_filter_ids[0] if all_filter_ids else None
+    # Stops at the first id that differs; the set is only built for the error message
+    multiple_ids = any(value != first_id for value in all_filter_ids)
 
     # Check for IN clauses: filter_field IN (1,2,3)
-    in_clause_matches = re.findall(rf'\b{filter_field}\s+IN\s*\([^)]+\)', sql_normalized, re.IGNORECASE)
-    if in_clause_matches:
+    if facts.in_clause:
         passed = False
         checks.append({
             "name": "Single Client",
             "status": "FAIL",
             "message": f"Query uses IN clause with multiple {filter_field}s - data isolation violated"
         })
-        logger.warning(f"Validation FAILED: IN clause detected with multiple {filter_field}s")
-    elif len(set(all_filter_ids)) > 1:
+        logger.warning("Validation FAILED: IN clause detected with multiple %ss", filter_field)
+    elif multiple_ids:
         # Multiple different filter IDs found
         passed = False
+        referenced_ids = set(all_filter_ids)
         checks.append({
             "name": "Single Client",
             "status": "FAIL",
-            "message": f"Query references multiple {filter_field}s: {set(all_filter_ids)}"
+            "message": f"Query references multiple {filter_field}s: {referenced_ids}"
         })
-        logger.warning(f"Validation FAILED: Multiple {filter_field}s found: {set(all_filter_ids)}")
-    elif all_filter_ids and all_filter_ids[0] != expected_client_id:
+        logger.warning("Validation FAILED: Multiple %ss found: %s", filter_field, referenced_ids)
+    elif all_filter_ids and first_id != expected_id:
         # Found a filter_field but it doesn't match expected
         passed = False
         checks.append({
             "name": "Single Client",
             "status": "FAIL",
-            "message": f"Query filters by {filter_field} = {all_filter_ids[0]} but expected {expected_client_id}"
+            "message": f"Query filters by {filter_field} = {first_id} but expected {expected_client_id}"
         })
-        logger.warning(f"Validation FAILED: Wrong {filter_field} {all_filter_ids[0]} vs expected {expected_client_id}")
+        logger.warning("Validation FAILED: Wrong %s %s vs expected %s", filter_field, first_id, expected_client_id)
     else:
-        checks.append({
-            "name": "Single Client",
-            "status": "PASS",
-            "message": "Query correctly references only one client"
-        })
-        logger.debug(f"Single client check: PASS")
+        checks.append(_SINGLE_CLIENT_PASS)
+        logger.debug("Single client check: PASS")
 
     # ==========================================
     # Check 3: Read-Only
@@ -204,15 +578,8 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
     # Block destructive SQL operations
     # POC should only allow SELECT queries
 
-    destructive_keywords = ["DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "TRUNCATE", "CREATE", "GRANT", "REVOKE"]
-
-    found_destructive = None
-    for keyword in destructive_keywords:
-        # Use word boundaries to avoid false positives (e.g., "UPDATE" in column name)
-        pattern = rf'\b{keyword}\b'
-        if re.search(pattern, sql_upper):
-            found_destructive = keyword
-            break
+    # Use word boundaries to avoid false positives (e.g., "UPDATE" in column name)
+    found_destructive = facts.destructive
 
     if found_destructive:
         passed = False
@@ -221,59 +588,45 @@ def validate_sql_for_client_isolation(sql_query, expected_client_id, dataset_con
             "status": "FAIL",
             "message": f"Destructive keyword detected: {found_destructive}. Only SELECT queries allowed."
         })
-        logger.warning(f"Validation FAILED: Destructive keyword '{found_destructive}' detected")
+        logger.warning("Validation FAILED: Destructive keyword '%s' detected", found_destructive)
     else:
-        checks.append({
-            "name": "Read-Only",
-            "status": "PASS",
-            "message": "Query is read-only (SELECT only)"
-        })
-        logger.debug(f"Read-only check: PASS")
+        checks.append(_READ_ONLY_PASS)
+        logger.debug("Read-only check: PASS")
 
     # ==========================================
     # Warnings (informational, don't fail validation)
     # ==========================================
 
     # Warning 1: Multiple WHERE clauses (could indicate complex JOIN logic)
-    where_count = sql_upper.count("WHERE")
+    where_count = facts.where_count
     if where_count > 1:
         warnings.append({
             "type": "MULTIPLE_WHERE",
             "message": f"Multiple WHERE clauses detected ({where_count}) - verify JOIN logic includes {filter_field} filtering"
         })
-        logger.info(f"Warning: Multiple WHERE clauses ({where_count})")
+        logger.info("Warning: Multiple WHERE clauses (%s)", where_count)
 
     # Warning 2: Subqueries detected
-    if "SELECT" in sql_upper and sql_upper.count("SELECT") > 1:
+    if facts.select_count > 1:
         warnings.append({
             "type": "SUBQUERY",
             "message": f"Subquery detected - ensure all subqueries filter by {filter_field}"
         })
-        logger.info(f"Warning: Subquery detected")
+        logger.info("Warning: Subquery detected")
 
     # Warning 3: UNION detected (could bypass filters)
-    if "UNION" in sql_upper:
+    if facts.has_union:
         warnings.append({
             "type": "UNION",
             "message": f"UNION detected - verify both queries filter by {filter_field}"
         })
-        logger.info(f"Warning: UNION detected")
-
-    execution_time = time.time() - start_time
+        logger.info("Warning: UNION detected")
 
-    result = ValidationResult(
-        passed=passed,
-        checks=checks,
-        warnings=warnings,
-        execution_time=execution_time
-    )
+    return passed, tuple(checks), tuple(warnings)
 
-    if passed:
-        logger.info(f"✓ Validation PASSED in {execution_time:.3f}s")
-    else:
-        logger.error(f"✗ Validation FAILED in {execution_time:.3f}s")
 
-    return result
+# Drop memoized results (tests, or after changing validation rules at runtime)
+validate_sql_for_client_isolation.cache_clear = _validate_cached.cache_clear
 
 
 def get_validation_summary(validation_result):
@@ -287,7 +640,7 @@ def get_validation_summary(validation_result):
         dict: Summary with passed status, total checks, failed checks
     """
     total_checks = len(validation_result.checks)
-    failed_checks = len([c for c in validation_result.checks if c['status'] == 'FAIL'])
+    failed_checks = sum(1 for c in validation_result.checks if c['status'] == 'FAIL')
     passed_checks = total_checks - failed_checks
 
     return {
@@ -361,13 +714,13 @@ if __name__ == '__main__':
     passed_tests = 0
     failed_tests = 0
 
-    for i, test in enumerate(TEST_CASES, 1):
+    results = validate_sql_batch([t['sql'] for t in TEST_CASES], [t['client_id'] for t in TEST_CASES])
+
+    for i, (test, result) in enumerate(zip(TEST_CASES, results), 1):
         print(f"\nTest {i}: {test['name']}")
         print(f"SQL: {test['sql'][:80]}...")
         print(f"Expected client_id: {test['client_id']}")
 
-        result = validate_sql_for_client_isolation(test['sql'], test['client_id'])
-
         print(f"Result: {'PASS' if result.passed else 'FAIL'}")
         print(f"Checks:")
         for check in result.checks:
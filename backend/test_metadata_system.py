@@ -13,8 +13,12 @@ Tests:
 
 import sys
 import logging
+from collections import defaultdict
+from itertools import islice
 from pathlib import Path
 
+import pytest
+
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -25,16 +29,32 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+_BANNER = "=" * 70
 
-def test_metadata_loader():
-    """Test basic metadata loading."""
-    print("\n" + "=" * 70)
-    print("TEST 1: Metadata Loader")
-    print("=" * 70)
-    
+
+def _hdr(n, title):
+    """Print the numbered section header for a test."""
+    print(f"\n{_BANNER}\nTEST {n}: {title}\n{_BANNER}")
+
+
+@pytest.fixture(scope="session")
+def loader():
+    """em_market metadata loader, shared by every test in the run."""
     from services.metadata_loader import load_dataset_metadata
+    return load_dataset_metadata("em_market")
+
+
+@pytest.fixture(scope="session")
+def tools():
+    """em_market metadata tool set, built once for the run."""
+    from services.agent_tools import create_metadata_tools_for_dataset
+    return create_metadata_tools_for_dataset("em_market", "../data/market_size.db")
+
+
+def test_metadata_loader(loader):
+    """Test basic metadata loading."""
+    _hdr(1, "Metadata Loader")
     
-    loader = load_dataset_metadata("em_market")
     stats = loader.get_statistics()
     
     print(f"\nDataset: {stats['dataset_id']}")
@@ -52,15 +72,11 @@ def test_metadata_loader():
         for rule in rules[:3]:
             title = rule.metadata.get('rule_title', 'Unknown')
             print(f"  • {title}")
-    
-    return loader
 
 
 def test_business_rules_search(loader):
     """Test searching business rules."""
-    print("\n" + "=" * 70)
-    print("TEST 2: Business Rules Search")
-    print("=" * 70)
+    _hdr(2, "Business Rules Search")
     
     test_queries = [
         "market size by country",
@@ -70,10 +86,8 @@ def test_business_rules_search(loader):
     
     for query in test_queries:
         print(f"\n🔍 Query: '{query}'")
-        results = loader.search_content(query)
-        
-        # Filter for business rules only
-        rule_results = [doc for doc in results if doc.metadata.get('type') == 'business_rule']
+        # Only business rules are searched
+        rule_results = loader.search_content(query, doc_type='business_rule')
         
         print(f"   Found {len(rule_results)} relevant rules:")
         for doc in rule_results[:2]:
@@ -81,18 +95,9 @@ def test_business_rules_search(loader):
             print(f"   • {title}")
 
 
-def test_metadata_tools():
+def test_metadata_tools(tools):
     """Test metadata tools integration."""
-    print("\n" + "=" * 70)
-    print("TEST 3: Metadata Tools")
-    print("=" * 70)
-    
-    from services.agent_tools import create_metadata_tools_for_dataset
-    
-    dataset_id = "em_market"
-    db_path = "../data/market_size.db"
-    
-    tools = create_metadata_tools_for_dataset(dataset_id, db_path)
+    _hdr(3, "Metadata Tools")
     
     print(f"\n✅ Created {len(tools)} tools:")
     for tool_name, tool in tools.items():
@@ -140,21 +145,15 @@ def test_metadata_tools():
         print(f"   Retrieved {len(samples)} sample rows")
         if samples:
             print(f"\n   Sample row 1:")
-            for key, value in list(samples[0].items())[:5]:
-                print(f"      {key}: {value}")
+            print("\n".join(f"      {key}: {value}" for key, value in islice(samples[0].items(), 5)))
     else:
         print(f"   ❌ Failed: {result['error']}")
 
 
-def test_query_patterns():
+def test_query_patterns(loader):
     """Test query pattern retrieval."""
-    print("\n" + "=" * 70)
-    print("TEST 4: Query Patterns")
-    print("=" * 70)
+    _hdr(4, "Query Patterns")
     
-    from services.metadata_loader import load_dataset_metadata
-    
-    loader = load_dataset_metadata("em_market")
     patterns = loader.get_documents_by_type("query_pattern")
     
     print(f"\n📊 Total Query Patterns: {len(patterns)}")
@@ -166,24 +165,16 @@ def test_query_patterns():
             print(f"   • {title}")
 
 
-def test_table_metadata():
+def test_table_metadata(loader):
     """Test table metadata retrieval."""
-    print("\n" + "=" * 70)
-    print("TEST 5: Table Metadata")
-    print("=" * 70)
-    
-    from services.metadata_loader import load_dataset_metadata
+    _hdr(5, "Table Metadata")
     
-    loader = load_dataset_metadata("em_market")
     table_docs = loader.get_documents_by_type("table_metadata")
     
     # Group by file
-    by_file = {}
+    by_file = defaultdict(list)
     for doc in table_docs:
-        file_name = doc.file_name
-        if file_name not in by_file:
-            by_file[file_name] = []
-        by_file[file_name].append(doc)
+        by_file[doc.file_name].append(doc)
     
     print(f"\n📊 Tables with Metadata: {len(by_file)}")
     
@@ -196,29 +187,35 @@ def test_table_metadata():
 
 def run_all_tests():
     """Run all tests."""
-    print("\n" + "=" * 70)
+    print("\n" + _BANNER)
     print("🚀 METADATA SYSTEM TEST SUITE")
-    print("=" * 70)
+    print(_BANNER)
     
     try:
+        from services.agent_tools import create_metadata_tools_for_dataset
+        from services.metadata_loader import load_dataset_metadata
+        
+        loader = load_dataset_metadata("em_market")
+        tools = create_metadata_tools_for_dataset("em_market", "../data/market_size.db")
+        
         # Test 1: Metadata Loader
-        loader = test_metadata_loader()
+        test_metadata_loader(loader)
         
         # Test 2: Business Rules Search
         test_business_rules_search(loader)
         
         # Test 3: Metadata Tools
-        test_metadata_tools()
+        test_metadata_tools(tools)
         
         # Test 4: Query Patterns
-        test_query_patterns()
+        test_query_patterns(loader)
         
         # Test 5: Table Metadata
-        test_table_metadata()
+        test_table_metadata(loader)
         
-        print("\n" + "=" * 70)
+        print("\n" + _BANNER)
         print("✅ ALL TESTS COMPLETED SUCCESSFULLY")
-        print("=" * 70)
+        print(_BANNER)
         print("\nNext Steps:")
         print("1. Integrate metadata tools into agentic_text2sql_service.py")
         print("2. Add metadata context to SQL generation prompts")
@@ -226,9 +223,7 @@ def run_all_tests():
         print("4. Monitor improvement in query accuracy")
         
     except Exception as e:
-        print(f"\n❌ TEST FAILED: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ TEST FAILED: %s", e)
 
 
 if __name__ == "__main__":
@@ -149,29 +149,31 @@ def test_api_endpoints():
     print("# API ENDPOINT TESTS (No Claude API Required)")
     print("#"*70)
 
-    # Test /health
-    print("\n## Testing /health endpoint...")
-    try:
-        response = requests.get(f"{BASE_URL}/health")
-        print(f"Status: {response.status_code}")
-        health_data = response.json()
-        print(f"Database: {health_data['database']}")
-        print(f"Tables: {health_data['tables']}")
-        print("✓ Health check PASSED")
-    except Exception as e:
-        print(f"✗ Health check FAILED: {e}")
-
-    # Test /clients
-    print("\n## Testing /clients endpoint...")
-    try:
-        response = requests.get(f"{BASE_URL}/clients")
-        print(f"Status: {response.status_code}")
-        clients_data = response.json()
-        print(f"Client count: {clients_data['count']}")
-        print(f"First client: {clients_data['clients'][0]}")
-        print("✓ Clients endpoint PASSED")
-    except Exception as e:
-        print(f"✗ Clients endpoint FAILED: {e}")
+    # One keep-alive connection serves every endpoint probe
+    with requests.Session() as session:
+        # Test /health
+        print("\n## Testing /health endpoint...")
+        try:
+            response = session.get(f"{BASE_URL}/health")
+            print(f"Status: {response.status_code}")
+            health_data = response.json()
+            print(f"Database: {health_data['database']}")
+            print(f"Tables: {health_data['tables']}")
+            print("✓ Health check PASSED")
+        except Exception as e:
+            print(f"✗ Health check FAILED: {e}")
+
+        # Test /clients
+        print("\n## Testing /clients endpoint...")
+        try:
+            response = session.get(f"{BASE_URL}/clients")
+            print(f"Status: {response.status_code}")
+            clients_data = response.json()
+            print(f"Client count: {clients_data['count']}")
+            print(f"First client: {clients_data['clients'][0]}")
+            print("✓ Clients endpoint PASSED")
+        except Exception as e:
+            print(f"✗ Clients endpoint FAILED: {e}")
 
     print("\n" + "#"*70 + "\n")
 
@@ -0,0 +1,86 @@
+"""
+Tests for the corp_id safety net in AgenticText2SQLService.
+Covers the filter check in _ensure_corp_id_filter, the AST injection in
+_inject_corp_id_predicate and the string fallback for SQL that does not parse.
+"""
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.agentic_text2sql_service import AgenticText2SQLService, _parse_sql
+
+
+@pytest.fixture(scope="module")
+def service():
+    """AgenticText2SQLService shared by the module's tests"""
+    return AgenticText2SQLService()
+
+
+def ensure(service, sql, client_id=1):
+    return service._ensure_corp_id_filter(sql, client_id, tree=_parse_sql(sql))
+
+
+def test_existing_filter_is_kept(service):
+    """SQL that already filters on the client is returned unchanged"""
+    sql = "SELECT * FROM t WHERE corp_id = 1"
+    assert ensure(service, sql) == sql
+
+
+def test_filter_in_comment_does_not_count(service):
+    """corp_id = 1 inside a comment is not a filter"""
+    assert ensure(service, "SELECT * FROM t -- corp_id = 1") == (
+        "SELECT * FROM t /* corp_id = 1 */ WHERE corp_id = 1"
+    )
+
+
+def test_filter_in_string_literal_does_not_count(service):
+    """corp_id = 1 inside a string literal is not a filter"""
+    assert ensure(service, "SELECT * FROM t WHERE name = 'corp_id = 1'") == (
+        "SELECT * FROM t WHERE name = 'corp_id = 1' AND corp_id = 1"
+    )
+
+
+def inject(sql, client_id=1):
+    tree = _parse_sql(sql).copy()
+    assert AgenticText2SQLService._inject_corp_id_predicate(tree, client_id)
+    return tree.sql(dialect="sqlite")
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t", "SELECT a FROM t WHERE corp_id = 1"),
+    ("SELECT a FROM t GROUP BY a ORDER BY a LIMIT 5",
+     "SELECT a FROM t WHERE corp_id = 1 GROUP BY a ORDER BY a LIMIT 5"),
+    ("(SELECT a FROM t)", "(SELECT a FROM t WHERE corp_id = 1)"),
+    ("SELECT a FROM t UNION SELECT a FROM u",
+     "SELECT a FROM t WHERE corp_id = 1 UNION SELECT a FROM u WHERE corp_id = 1"),
+    ("SELECT a FROM t WHERE x = 1 OR y = 2",
+     "SELECT a FROM t WHERE (x = 1 OR y = 2) AND corp_id = 1"),
+    ("SELECT a FROM t WHERE corp_id = 12",
+     "SELECT a FROM t WHERE corp_id = 12 AND corp_id = 1"),
+])
+def test_inject_predicate(sql, expected):
+    """The predicate is ANDed into every outer SELECT, keeping OR clauses grouped"""
+    assert inject(sql) == expected
+
+
+def test_inject_predicate_rejects_non_select():
+    """Statements that are not SELECTs are left to the string fallback"""
+    tree = _parse_sql("INSERT INTO t VALUES (1)").copy()
+    assert not AgenticText2SQLService._inject_corp_id_predicate(tree, 1)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t WHERE x = 1 OR y = 2 GROUP BY a",
+     "SELECT a FROM t WHERE corp_id = 1 AND (x = 1 OR y = 2) GROUP BY a"),
+    ("SELECT a FROM t WHERE x = 1 OR y = 2;",
+     "SELECT a FROM t WHERE corp_id = 1 AND (x = 1 OR y = 2)"),
+    ("SELECT a FROM t GROUP BY a LIMIT 5", "SELECT a FROM t WHERE corp_id = 1 GROUP BY a LIMIT 5"),
+    ("SELECT a FROM t;", "SELECT a FROM t WHERE corp_id = 1"),
+])
+def test_string_fallback(service, sql, expected):
+    """Without a parse tree the filter is spliced in as text"""
+    assert service._ensure_corp_id_filter(sql, 1, tree=None) == expected
@@ -0,0 +1,39 @@
+"""
+Tests for the per-query selection of overflow dataset instruction sections.
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.claude_service import _DatasetInstructions, _split_instructions
+
+BRAND_RULES = "Brand revenue rules: sum revenue per brand over the selected period."
+REGION_RULES = "Region revenue rules: map each country to its sales region."
+
+
+def test_single_candidate_is_selected():
+    """The only candidate section is picked when the query matches it"""
+    instructions = _DatasetInstructions("", [BRAND_RULES], budget=1000)
+    assert instructions.select("brand revenue") == BRAND_RULES
+
+
+def test_word_in_every_candidate_still_scores():
+    """A query word shared by all candidates selects them rather than none"""
+    instructions = _DatasetInstructions("", [BRAND_RULES, REGION_RULES], budget=1000)
+    assert instructions.select("revenue") == BRAND_RULES + "\n\n" + REGION_RULES
+
+
+def test_unrelated_query_selects_nothing():
+    """Candidates that share no word with the query are left out"""
+    instructions = _DatasetInstructions("", [BRAND_RULES], budget=1000)
+    assert instructions.select("weather forecast") == ""
+
+
+def test_split_selects_within_cap():
+    """Overflow sections are chosen per query within the rest of the cap"""
+    instructions = _split_instructions(["a" * 20, BRAND_RULES, REGION_RULES], 120)
+    assert instructions.fixed == "a" * 20
+    assert instructions.select("brand revenue") == BRAND_RULES
+    assert instructions.select("country region") == REGION_RULES
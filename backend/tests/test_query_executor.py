@@ -0,0 +1,47 @@
+"""
+Tests for QueryExecutor's read-only guard.
+Runs against a throwaway SQLite file.
+"""
+import sys
+import os
+import sqlite3
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.query_executor import QueryExecutor
+
+
+@pytest.fixture(scope="module")
+def executor(tmp_path_factory):
+    """QueryExecutor over a small database with one table"""
+    db_path = tmp_path_factory.mktemp("db") / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.execute("INSERT INTO notes (body) VALUES ('Delete me later')")
+    conn.commit()
+    conn.close()
+    return QueryExecutor(str(db_path))
+
+
+def test_keyword_in_string_literal_is_allowed(executor):
+    """A write keyword inside a string literal does not block a SELECT"""
+    result = executor.execute_query("SELECT * FROM sqlite_master WHERE name = 'Delete'")
+    assert result["row_count"] == 0
+
+    result = executor.execute_query("SELECT body FROM notes WHERE body = 'Delete me later'")
+    assert result["row_count"] == 1
+
+
+@pytest.mark.parametrize("sql, keyword", [
+    ("DELETE FROM notes", "DELETE"),
+    ("SELECT 1; DROP TABLE notes", "DROP"),
+    ("PRAGMA writable_schema = 1", "PRAGMA"),
+    ("ATTACH DATABASE 'other.db' AS other", "ATTACH"),
+])
+def test_non_read_statements_are_rejected(executor, sql, keyword):
+    """Writes, PRAGMA and ATTACH never reach SQLite"""
+    with pytest.raises(ValueError, match=f"{keyword} is not allowed"):
+        executor.execute_query(sql)
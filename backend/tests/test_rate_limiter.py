@@ -0,0 +1,69 @@
+"""
+Tests for the Claude client-side rate limiter.
+"""
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.claude_service import _RateLimiter
+
+
+@pytest.mark.parametrize("requests_per_minute, tokens_per_minute", [
+    (0, 0),
+    (None, None),
+    (0, 24000),
+    (40, None),
+])
+def test_zero_or_none_is_unlimited(requests_per_minute, tokens_per_minute):
+    """A 0 or None limit never divides by zero and never blocks on that budget"""
+    limiter = _RateLimiter(requests_per_minute, tokens_per_minute)
+    for _ in range(3):
+        limiter.acquire(1000)
+
+
+@pytest.mark.parametrize("value", [-1, "40", True])
+def test_invalid_limit_rejected(value):
+    """Negative or non-numeric limits fail at construction"""
+    with pytest.raises(ValueError):
+        _RateLimiter(value, 24000)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; time.sleep advances it and records each wait"""
+    import services.claude_service as claude_module
+
+    state = {"now": 1000.0, "sleeps": []}
+
+    def sleep(seconds):
+        state["sleeps"].append(seconds)
+        state["now"] += seconds
+
+    monkeypatch.setattr(claude_module.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(claude_module.time, "sleep", sleep)
+    return state
+
+
+def test_request_budget_blocks_until_refill(clock):
+    """With 2 requests/minute the third acquire sleeps until one request refills"""
+    limiter = _RateLimiter(2, None)
+    limiter.acquire(100)
+    limiter.acquire(100)
+    assert clock["sleeps"] == []
+
+    limiter.acquire(100)
+    assert clock["sleeps"] == [pytest.approx(30.0)]
+
+
+def test_token_budget_blocks_until_refill(clock):
+    """A request that does not fit the remaining token budget waits for the refill"""
+    limiter = _RateLimiter(None, 6000)
+    limiter.acquire(4000)
+    assert clock["sleeps"] == []
+
+    limiter.acquire(4000)
+    assert clock["sleeps"] == [pytest.approx(20.0)]
@@ -0,0 +1,62 @@
+"""
+Tests for the semantic SQL cache.
+Near-duplicate questions that differ in a year, number or name must not share SQL.
+"""
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.semantic_cache import SemanticCache, get_semantic_cache, query_signature
+
+
+def test_semantic_cache_disabled_by_default():
+    """The shipped config leaves the semantic cache off"""
+    assert Config.SEMANTIC_CACHE_ENABLED is False
+    assert get_semantic_cache() is None
+
+
+def test_signature_differs_by_year():
+    """Questions that differ only in the year get different signatures"""
+    assert query_signature("revenue in 2023") != query_signature("revenue in 2024")
+
+
+def test_signature_differs_by_number_and_name():
+    """Top-N and named entities are part of the signature"""
+    assert query_signature("top 5 brands by revenue") != query_signature("top 10 brands by revenue")
+    assert query_signature("market size in Brazil") != query_signature("market size in Mexico")
+    assert query_signature("sales for 'Acme'") != query_signature("sales for 'Globex'")
+
+
+def test_signature_ignores_paraphrase():
+    """Paraphrases with the same literal values still share a signature"""
+    assert query_signature("top brands by revenue in 2023") == query_signature(
+        "which brands have the highest revenue in 2023"
+    )
+
+
+def test_signature_skips_sentence_initial_words():
+    """A capitalized first word is not a name, so capitalized paraphrases still match"""
+    assert query_signature("Top brands by revenue in 2023") == query_signature(
+        "Which brands have the highest revenue in 2023"
+    )
+    assert query_signature("Show revenue in 2023. Break it down by brand") == query_signature(
+        "What was revenue in 2023? Split it by brand"
+    )
+    assert query_signature("Top brands in Brazil") != query_signature("Top brands in Mexico")
+
+
+def test_lookup_rejects_year_near_miss():
+    """A stored 2023 answer is not returned for the same question about 2024"""
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("sqlite_vec")
+
+    cache = SemanticCache()
+    cache.store("em_market:1:schema", "total revenue in 2023", "SELECT 2023")
+
+    assert cache.lookup("em_market:1:schema", "total revenue in 2024") is None
+    assert cache.lookup("em_market:1:schema", "total revenue in 2023") == ("SELECT 2023", None)
@@ -5,6 +5,8 @@ Verifies dataset_id flows correctly through all services.
 import sys
 import os
 
+import pytest
+
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -12,9 +14,21 @@ from services.agentic_text2sql_service import AgenticText2SQLService
 from services.claude_service import ClaudeService
 
 
-def test_agentic_service_accepts_dataset_id():
+@pytest.fixture(scope="module")
+def em_market_agentic():
+    """em_market AgenticText2SQLService shared by the module's tests"""
+    return AgenticText2SQLService(dataset_id='em_market')
+
+
+@pytest.fixture(scope="module")
+def em_market_claude():
+    """em_market ClaudeService shared by the module's tests"""
+    return ClaudeService(dataset_id='em_market')
+
+
+def test_agentic_service_accepts_dataset_id(em_market_agentic):
     """Test AgenticText2SQLService accepts dataset_id parameter"""
-    service = AgenticText2SQLService(dataset_id='em_market')
+    service = em_market_agentic
     assert service.dataset_id == 'em_market', "AgenticText2SQLService should store dataset_id"
     assert service.claude_service.dataset_id == 'em_market', "ClaudeService should receive dataset_id"
     print("✓ AgenticText2SQLService passes dataset_id to ClaudeService")
@@ -28,32 +42,57 @@ def test_service_without_dataset_id():
     print("✓ Services work without dataset_id (fallback behavior)")
 
 
-def test_claude_service_dataset_id():
+def test_claude_service_dataset_id(em_market_claude):
     """Test ClaudeService stores dataset_id"""
-    claude = ClaudeService(dataset_id='em_market')
+    claude = em_market_claude
     assert claude.dataset_id == 'em_market', "ClaudeService should store dataset_id"
     print("✓ ClaudeService stores dataset_id")
 
 
-def test_claude_service_loads_metadata():
+def test_claude_service_loads_metadata(em_market_claude):
     """Test ClaudeService loads dataset-specific instructions"""
-    claude = ClaudeService(dataset_id='em_market')
+    claude = em_market_claude
     # Should have loaded instructions from metadata
     assert claude.dataset_specific_instructions != "", "Should have loaded metadata instructions"
     assert len(claude.dataset_specific_instructions) > 100, "Instructions should have content"
     print(f"✓ ClaudeService loaded {len(claude.dataset_specific_instructions)} chars of metadata")
 
 
-def test_dataset_id_in_multiple_services():
+def test_dataset_id_in_multiple_services(em_market_agentic, em_market_claude):
     """Test dataset_id consistency across multiple service instances"""
-    agentic = AgenticText2SQLService(dataset_id='em_market')
-    claude = ClaudeService(dataset_id='em_market')
+    agentic = em_market_agentic
+    claude = em_market_claude
 
     assert agentic.dataset_id == claude.dataset_id, "Both services should have same dataset_id"
     assert agentic.claude_service.dataset_id == claude.dataset_id, "Nested service should match"
     print("✓ Dataset ID consistent across multiple service instances")
 
 
+def test_claude_service_get_shares_instance():
+    """Test ClaudeService.get() returns one shared instance per dataset, even for concurrent first calls"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    ClaudeService.clear_instances()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        instances = list(pool.map(lambda _: ClaudeService.get('sales'), range(8)))
+
+    assert all(instance is instances[0] for instance in instances), "get() should build one instance per dataset"
+    assert ClaudeService.get('sales') is instances[0], "Later calls should reuse the instance"
+    assert ClaudeService.get('em_market') is not instances[0], "Each dataset gets its own instance"
+    assert instances[0].dataset_id == 'sales'
+    print("✓ ClaudeService.get() shares one instance per dataset")
+
+
+def test_config_reload_drops_shared_claude_service():
+    """Test Config.reload() drops shared ClaudeService instances so config changes take effect"""
+    from config import Config
+
+    claude = ClaudeService.get('sales')
+    Config.reload()
+    assert ClaudeService.get('sales') is not claude, "get() after reload should build a fresh instance"
+    print("✓ Config.reload() drops shared ClaudeService instances")
+
+
 if __name__ == '__main__':
     print("="*70)
     print("Story 5: Service Integration Test Suite")
@@ -61,15 +100,20 @@ if __name__ == '__main__':
     print()
 
     try:
-        test_agentic_service_accepts_dataset_id()
+        agentic = AgenticText2SQLService(dataset_id='em_market')
+        claude = ClaudeService(dataset_id='em_market')
+
+        test_agentic_service_accepts_dataset_id(agentic)
         test_service_without_dataset_id()
-        test_claude_service_dataset_id()
-        test_claude_service_loads_metadata()
-        test_dataset_id_in_multiple_services()
+        test_claude_service_dataset_id(claude)
+        test_claude_service_loads_metadata(claude)
+        test_dataset_id_in_multiple_services(agentic, claude)
+        test_claude_service_get_shares_instance()
+        test_config_reload_drops_shared_claude_service()
 
         print()
         print("="*70)
-        print("✅ All 5 tests passed!")
+        print("✅ All 7 tests passed!")
         print("="*70)
 
     except AssertionError as e:
@@ -0,0 +1,107 @@
+"""
+Tests for the client isolation validator (services/sql_validator.py).
+Covers the sqlglot path, the regex fallback and the leading-keyword fast reject.
+"""
+import sys
+import os
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sql_validator import _parse_sql, validate_sql_for_client_isolation
+
+BRAND_HIERARCHY = {"client_isolation": {"filter_field": "corp_id", "method": "brand-hierarchy"}}
+
+
+def statuses(result):
+    """Map check name to PASS/FAIL"""
+    return {check["name"]: check["status"] for check in result.checks}
+
+
+@pytest.mark.parametrize("sql, keyword", [
+    ("SELECT * FROM sales WHERE client_id = 1; DROP TABLE sales", "DROP"),
+    ("SELECT * FROM sales WHERE client_id = 1; DELETE FROM sales WHERE client_id = 1", "DELETE"),
+    ("WITH d AS (DELETE FROM sales WHERE client_id = 1 RETURNING *) SELECT * FROM d WHERE client_id = 1", "DELETE"),
+    ("PRAGMA table_info(sales)", "PRAGMA"),
+    ("ATTACH DATABASE 'other.db' AS other", "ATTACH"),
+])
+def test_non_read_statements_fail(sql, keyword):
+    """Writes hidden after a SELECT or in a CTE, PRAGMA and ATTACH are not read-only"""
+    result = validate_sql_for_client_isolation(sql, 1)
+    assert not result.passed
+    assert statuses(result)["Read-Only"] == "FAIL"
+    assert keyword in result.checks[-1]["message"]
+
+
+def test_leading_write_fails_fast():
+    """A statement opening with a write keyword reports only the Read-Only check"""
+    result = validate_sql_for_client_isolation("  (DELETE FROM sales", 1)
+    assert not result.passed
+    assert statuses(result) == {"Read-Only": "FAIL"}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sales WHERE client_id = 1 -- DROP TABLE sales",
+    "SELECT * FROM sales WHERE client_id = 1 AND note = 'delete'",
+])
+def test_keywords_in_comments_and_literals_are_ignored(sql):
+    """Write keywords inside comments and string literals do not fail Read-Only"""
+    assert validate_sql_for_client_isolation(sql, 1).passed
+
+
+def test_filter_in_comment_does_not_count():
+    """A client filter inside a comment does not satisfy Check 1"""
+    result = validate_sql_for_client_isolation("SELECT * FROM sales /* client_id = 1 */", 1)
+    assert statuses(result)["Client ID Filter"] == "FAIL"
+
+
+def test_filter_in_join_on_row_level():
+    """Row-level isolation needs the filter in a WHERE, not only in JOIN ON"""
+    sql = "SELECT * FROM sales s JOIN clients c ON c.client_id = 1 AND s.client_id = c.client_id"
+    result = validate_sql_for_client_isolation(sql, 1)
+    assert statuses(result)["Client ID Filter"] == "FAIL"
+
+
+def test_filter_in_join_on_brand_hierarchy():
+    """Brand-hierarchy isolation accepts the filter in a JOIN condition"""
+    sql = "SELECT * FROM fact f JOIN dim_brand b ON b.brand_id = f.brand_id AND b.corp_id = 1"
+    assert validate_sql_for_client_isolation(sql, 1, BRAND_HIERARCHY).passed
+
+
+@pytest.mark.parametrize("dataset_config", [None, BRAND_HIERARCHY])
+def test_union_branch_without_filter_fails(dataset_config):
+    """Every UNION branch must filter by the client"""
+    field = "corp_id" if dataset_config else "client_id"
+    unfiltered = f"SELECT a FROM t WHERE {field} = 1 UNION SELECT a FROM t"
+    filtered = f"SELECT a FROM t WHERE {field} = 1 UNION ALL SELECT a FROM t WHERE {field} = 1"
+
+    result = validate_sql_for_client_isolation(unfiltered, 1, dataset_config)
+    assert not result.passed
+    assert statuses(result)["Client ID Filter"] == "FAIL"
+    assert validate_sql_for_client_isolation(filtered, 1, dataset_config).passed
+
+
+def test_leading_zero_client_id():
+    """client_id = 05 is compared as the integer 5"""
+    assert validate_sql_for_client_isolation("SELECT * FROM sales WHERE client_id = 05", 5).passed
+    assert not validate_sql_for_client_isolation("SELECT * FROM sales WHERE client_id = 05", 1).passed
+
+
+def test_other_client_fails():
+    """A filter on a different client fails Single Client"""
+    result = validate_sql_for_client_isolation("SELECT * FROM sales WHERE client_id = 2", 1)
+    assert statuses(result)["Single Client"] == "FAIL"
+
+
+def test_fallback_when_parse_fails():
+    """SQL sqlglot cannot parse is checked by the regex scan"""
+    sql = "SELECT * FROM sales WHERE client_id = 1 AND amount >> "
+    assert _parse_sql(sql) is None
+    assert validate_sql_for_client_isolation(sql, 1).passed
+
+    missing = "SELECT * FROM sales WHERE amount >> "
+    assert _parse_sql(missing) is None
+    result = validate_sql_for_client_isolation(missing, 1)
+    assert statuses(result)["Client ID Filter"] == "FAIL"